@@ -1,15 +1,39 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-import httpx
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
+from collections import OrderedDict
+import aiohttp
 import asyncio
-from typing import Dict, Any
+import orjson
+import os
+import uvicorn
+from typing import Dict, Any, Optional, Set, Tuple
 import logging
 from pydantic import BaseModel
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="LLM Service", description="Інтеграція з Ollama та RAG системою")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Спільний HTTP клієнт на весь час життя застосунку"""
+    app.state.session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=200, limit_per_host=100, keepalive_timeout=75),
+        timeout=aiohttp.ClientTimeout(total=30),
+        json_serialize=lambda obj: orjson.dumps(obj).decode()
+    )
+    try:
+        yield
+    finally:
+        await app.state.session.close()
+
+app = FastAPI(
+    title="LLM Service",
+    description="Інтеграція з Ollama та RAG системою",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,89 +57,306 @@ class ChatResponse(BaseModel):
 OLLAMA_BASE_URL = "http://ollama:11434"
 RAG_SERVICE_URL = "http://rag-service:8000"
 
+# Скільки Ollama тримає модель у пам'яті після запиту (прогріву чи генерації).
+# Без змінної keep_alive не передається і діє OLLAMA_KEEP_ALIVE сервера Ollama
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE")
+
+# Максимальна пауза між токенами при потоковій генерації (секунди)
+OLLAMA_STREAM_READ_TIMEOUT = 60
+
+# Кеш відповідей: повторне питання отримує збережену відповідь лише тоді,
+# коли свіжо знайдені фрагменти суттєво збігаються з тими, на яких вона
+# була згенерована (інакше відповідь могла застаріти)
+ANSWER_CACHE_SIZE = 1024
+ANSWER_CACHE_MIN_JACCARD = 0.8
+_answer_cache: "OrderedDict[Tuple[str, int, str], Dict[str, Any]]" = OrderedDict()
+
+def _answer_cache_key(request: "ChatRequest") -> Tuple[str, int, str]:
+    return (request.model, request.max_tokens, " ".join(request.message.lower().split()))
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+# Незмінний початок RAG промпта. Ollama (llama.cpp) повторно використовує
+# KV-кеш для спільного префікса сусідніх промптів, тому інструкції йдуть
+# першими, фрагменти контексту - у стабільному порядку, а питання - останнім
+RAG_PROMPT_PREFIX = (
+    "Дайте відповідь на основі наданого контексту. "
+    "Якщо в контексті немає релевантної інформації, скажіть про це.\n\n"
+    "Контекст з бази знань:\n"
+)
+
+def _build_rag_prompt(message: str, chunks: Dict[str, str]) -> str:
+    """Промпт з фрагментами, впорядкованими за ID (а не за score)"""
+    context = "\n\n".join(chunks[chunk_id] for chunk_id in sorted(chunks))
+    return f"{RAG_PROMPT_PREFIX}{context}\n\nПитання користувача: {message}"
+
+async def _search_context(session: aiohttp.ClientSession, message: str) -> Optional[Dict[str, Any]]:
+    """Пошук контексту в RAG сервісі"""
+    async with session.post(
+        f"{RAG_SERVICE_URL}/search",
+        json={
+            "query": message,
+            "limit": 3
+        }
+    ) as rag_response:
+        return await rag_response.json(loads=orjson.loads) if rag_response.status == 200 else None
+
+def _with_keep_alive(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """keep_alive лише якщо його задано явно, щоб не перекривати налаштування Ollama"""
+    if OLLAMA_KEEP_ALIVE:
+        payload["keep_alive"] = OLLAMA_KEEP_ALIVE
+    return payload
+
+async def _warm_model(session: aiohttp.ClientSession, model: str):
+    """Завантаження моделі в Ollama (generate без промпта лише вантажить модель)"""
+    try:
+        async with session.post(
+            f"{OLLAMA_BASE_URL}/api/generate",
+            json=_with_keep_alive({"model": model})
+        ) as response:
+            await response.read()
+    except Exception as e:
+        logger.warning(f"Не вдалося прогріти модель {model}: {e}")
+
+# Прогріви, що виконуються зараз: не більше одного на модель
+_warm_tasks: Dict[str, asyncio.Task] = {}
+
+def _start_warm_model(session: aiohttp.ClientSession, model: str):
+    """Прогрів моделі у фоні, без очікування (пошук контексту його не чекає)"""
+    if model in _warm_tasks:
+        return
+    task = asyncio.create_task(_warm_model(session, model))
+    _warm_tasks[model] = task
+    task.add_done_callback(lambda _: _warm_tasks.pop(model, None))
+
+# Відповідь /health серіалізується один раз при імпорті
+HEALTH_BODY = orjson.dumps({"status": "healthy", "service": "llm-service"})
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "llm-service"}
+    return Response(content=HEALTH_BODY, media_type="application/json")
+
+# Залежності, без яких сервіс не може обслуговувати /chat
+READY_DEPENDENCIES = {
+    "ollama": f"{OLLAMA_BASE_URL}/api/tags",
+    "rag-service": f"{RAG_SERVICE_URL}/health",
+}
+# Жорсткий бюджет на перевірку та час життя результату
+READY_TIMEOUT = 0.5
+READY_CACHE_TTL = 1.5
+
+# Останній результат /ready: (час, HTTP статус, тіло)
+_ready_cache: Optional[Tuple[float, int, bytes]] = None
+
+async def _probe_dependency(session: aiohttp.ClientSession, url: str) -> bool:
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=READY_TIMEOUT)) as response:
+        return response.status < 500
+
+@app.get("/ready")
+async def readiness_check():
+    """Готовність: паралельна перевірка залежностей (кеш на READY_CACHE_TTL)"""
+    global _ready_cache
+    
+    loop = asyncio.get_running_loop()
+    if _ready_cache is not None and loop.time() - _ready_cache[0] < READY_CACHE_TTL:
+        return Response(content=_ready_cache[2], status_code=_ready_cache[1], media_type="application/json")
+    
+    results = await asyncio.gather(
+        *(_probe_dependency(app.state.session, url) for url in READY_DEPENDENCIES.values()),
+        return_exceptions=True
+    )
+    checks = {
+        name: "ok" if result is True else "fail"
+        for name, result in zip(READY_DEPENDENCIES, results)
+    }
+    ready = all(check == "ok" for check in checks.values())
+    
+    status_code = 200 if ready else 503
+    body = orjson.dumps({"status": "ready" if ready else "not_ready", "checks": checks})
+    _ready_cache = (loop.time(), status_code, body)
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+async def _prepare_chat(session: aiohttp.ClientSession, request: ChatRequest) -> Dict[str, Any]:
+    """Пошук контексту, перевірка кешу відповідей та формування промпта"""
+    context_chunks: Dict[str, str] = {}
+    sources = []
+    
+    cache_key = _answer_cache_key(request)
+    
+    if request.use_rag:
+        # Завантаження моделі в Ollama йде у фоні під час пошуку, щоб холодний
+        # старт не додавався до часу відповіді; для питань з кешу відповідей
+        # Ollama, найімовірніше, не знадобиться
+        if cache_key not in _answer_cache:
+            _start_warm_model(session, request.model)
+        rag_data = await _search_context(session, request.message)
+        
+        if rag_data:
+            for result in rag_data["results"]:
+                context_chunks[result["id"]] = result["text"]
+                sources.append({
+                    "source": result["metadata"].get("source", ""),
+                    "score": result["score"]
+                })
+    
+    evidence_ids = set(context_chunks)
+    cached_response = None
+    if evidence_ids:
+        cached = _answer_cache.get(cache_key)
+        if cached and _jaccard(cached["evidence_ids"], evidence_ids) >= ANSWER_CACHE_MIN_JACCARD:
+            _answer_cache.move_to_end(cache_key)
+            logger.info("Відповідь взято з кешу")
+            cached_response = cached["response"]
+    
+    # Формування промпта
+    if context_chunks:
+        prompt = _build_rag_prompt(request.message, context_chunks)
+    else:
+        prompt = request.message
+    
+    return {
+        "prompt": prompt,
+        "sources": sources,
+        "evidence_ids": evidence_ids,
+        "cache_key": cache_key,
+        "cached_response": cached_response
+    }
+
+def _store_answer(prepared: Dict[str, Any], response_text: str):
+    """Збереження відповіді в кеш (лише для відповідей з RAG контекстом)"""
+    if not prepared["evidence_ids"]:
+        return
+    cache_key = prepared["cache_key"]
+    _answer_cache[cache_key] = {
+        "response": response_text,
+        "evidence_ids": prepared["evidence_ids"]
+    }
+    _answer_cache.move_to_end(cache_key)
+    if len(_answer_cache) > ANSWER_CACHE_SIZE:
+        _answer_cache.popitem(last=False)
+
+def _generate_payload(request: ChatRequest, prompt: str, stream: bool) -> Dict[str, Any]:
+    return _with_keep_alive({
+        "model": request.model,
+        "prompt": prompt,
+        "stream": stream,
+        "options": {
+            "num_predict": request.max_tokens
+        }
+    })
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> bytes:
+    """Кадр Server-Sent Events"""
+    frame = b"data: " + orjson.dumps(data) + b"\n\n"
+    return f"event: {event}\n".encode() + frame if event else frame
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
+    session = app.state.session
     try:
-        context = ""
-        sources = []
+        prepared = await _prepare_chat(session, request)
         
-        if request.use_rag:
-            # Пошук в RAG системі
-            async with httpx.AsyncClient() as client:
-                rag_response = await client.post(
-                    f"{RAG_SERVICE_URL}/search",
-                    json={
-                        "query": request.message,
-                        "limit": 3
-                    }
-                )
-                
-                if rag_response.status_code == 200:
-                    rag_data = rag_response.json()
-                    
-                    for result in rag_data["results"]:
-                        context += f"\n{result['text']}\n"
-                        sources.append({
-                            "source": result["metadata"].get("source", ""),
-                            "score": result["score"]
-                        })
-        
-        # Формування промпта
-        if context:
-            prompt = f"""
-            Контекст з бази знань:
-            {context}
-            
-            Питання користувача: {request.message}
-            
-            Дайте відповідь на основі наданого контексту. Якщо в контексті немає релевантної інформації, скажіть про це.
-            """
-        else:
-            prompt = request.message
+        if prepared["cached_response"] is not None:
+            return ChatResponse(
+                response=prepared["cached_response"],
+                sources=prepared["sources"],
+                model_used=request.model
+            )
         
         # Запит до Ollama
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            ollama_response = await client.post(
-                f"{OLLAMA_BASE_URL}/api/generate",
-                json={
-                    "model": request.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "num_predict": request.max_tokens
-                    }
-                }
-            )
+        async with session.post(
+            f"{OLLAMA_BASE_URL}/api/generate",
+            json=_generate_payload(request, prepared["prompt"], stream=False)
+        ) as ollama_response:
+            ollama_data = await ollama_response.json(loads=orjson.loads) if ollama_response.status == 200 else None
+        
+        if ollama_data is not None:
+            response_text = ollama_data.get("response", "")
+            _store_answer(prepared, response_text)
             
-            if ollama_response.status_code == 200:
-                ollama_data = ollama_response.json()
-                response_text = ollama_data.get("response", "")
-                
-                return ChatResponse(
-                    response=response_text,
-                    sources=sources,
-                    model_used=request.model
-                )
-            else:
-                raise HTTPException(status_code=500, detail="Помилка Ollama API")
+            return ChatResponse(
+                response=response_text,
+                sources=prepared["sources"],
+                model_used=request.model
+            )
+        else:
+            raise HTTPException(status_code=500, detail="Помилка Ollama API")
                 
     except Exception as e:
         logger.error(f"Помилка чату: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Потокова відповідь (SSE): токени по мірі генерації, джерела - останньою подією"""
+    session = app.state.session
+    try:
+        prepared = await _prepare_chat(session, request)
+    except Exception as e:
+        logger.error(f"Помилка чату: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def events():
+        if prepared["cached_response"] is not None:
+            yield _sse({"response": prepared["cached_response"]})
+        else:
+            parts = []
+            try:
+                # Без загального таймауту: обмежується лише пауза між токенами
+                async with session.post(
+                    f"{OLLAMA_BASE_URL}/api/generate",
+                    json=_generate_payload(request, prepared["prompt"], stream=True),
+                    timeout=aiohttp.ClientTimeout(total=None, sock_read=OLLAMA_STREAM_READ_TIMEOUT)
+                ) as ollama_response:
+                    if ollama_response.status != 200:
+                        yield _sse({"detail": "Помилка Ollama API"}, event="error")
+                        return
+                    
+                    async for line in ollama_response.content:
+                        if not line.strip():
+                            continue
+                        data = orjson.loads(line)
+                        token = data.get("response", "")
+                        if token:
+                            parts.append(token)
+                            yield _sse({"response": token})
+                        if data.get("done"):
+                            break
+            except Exception as e:
+                logger.error(f"Помилка потокового чату: {e}")
+                yield _sse({"detail": str(e)}, event="error")
+                return
+            
+            _store_answer(prepared, "".join(parts))
+        
+        yield _sse({"sources": prepared["sources"], "model_used": request.model}, event="sources")
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 @app.get("/models")
 async def get_available_models():
+    session = app.state.session
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{OLLAMA_BASE_URL}/api/tags")
-            if response.status_code == 200:
-                return response.json()
+        async with session.get(f"{OLLAMA_BASE_URL}/api/tags") as response:
+            if response.status == 200:
+                return await response.json(loads=orjson.loads)
             else:
                 return {"models": []}
     except Exception as e:
         logger.error(f"Помилка отримання моделей: {e}")
         return {"models": []}
+
+if __name__ == "__main__":
+    # Сервіс без стану: воркер на ядро, якщо WEB_CONCURRENCY не задано
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        log_level="info"
+    )
@@ -1,5 +1,5 @@
 # rag-service/app/config.py
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
 
 class Settings(BaseSettings):
@@ -8,14 +8,41 @@ class Settings(BaseSettings):
 
     # Модель для ембедінгів
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # Бекенд інференсу на CPU: "onnx", "openvino" або "torch"
+    EMBEDDING_BACKEND: str = "onnx"
+    EMBEDDING_ONNX_FILE: str = "onnx/model_O3.onnx"
+    # Розмір батчу encode (256 вигідніше на GPU)
+    EMBEDDING_BATCH_SIZE: int = 128
     
     # Настройки чанкування
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    # Чанкування за токенами моделі ембедінгів (замість символів)
+    TOKEN_CHUNKING: bool = True
+    CHUNK_TOKENS: int = 256
+    CHUNK_TOKEN_OVERLAP: int = 32
     
     # База даних
     COLLECTION_NAME: str = "documents"
     
+    # In-process дзеркало колекції для пошуку: "faiss", "numpy" або "chroma"
+    VECTOR_INDEX: str = "faiss"
+    # Тип зберігання векторів у ньому: "float32", "float16" або "int8".
+    # float16 вдвічі зменшує пам'ять дзеркала без втрати recall, а FAISS
+    # шукає у ньому швидше, ніж у float32. Для VECTOR_INDEX=numpy краще
+    # int8 (Numba) або float32: numpy не має BLAS для float16
+    VECTOR_INDEX_DTYPE: str = "float16"
+    
+    # Семантичний кеш пошуку
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_SIZE: int = 1024
+    
+    # Батчування індексації
+    INGEST_BATCH_SIZE: int = 200
+    INGEST_FLUSH_INTERVAL: float = 1.0
+    # Кількість файлів, що обробляються одночасно
+    INGEST_CONCURRENCY: int = 4
+    
     # Директорії
     UPLOAD_DIR: str = "/app/data/uploads"
     PROCESSED_DIR: str = "/app/data/processed"
@@ -30,12 +57,19 @@ class Settings(BaseSettings):
     # Redis (опціонально)
     REDIS_URL: Optional[str] = "redis://redis:6379/0"
     
+    # Кеш ембедінгів чанків у Redis (повторна індексація)
+    EMBEDDING_CACHE: bool = True
+    EMBEDDING_CACHE_TTL: int = 7 * 24 * 3600
+    
+    # Черга задач обробки на Redis (arq)
+    TASK_QUEUE_MAX_JOBS: int = 16
+    TASK_JOB_TIMEOUT: int = 300
+    TASK_MAX_TRIES: int = 3
+    
     # Максимальні розміри
     MAX_FILE_SIZE: int = 100 * 1024 * 1024  # 100MB
     MAX_CHUNK_SIZE: int = 2000
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=True)
 
 settings = Settings()
@@ -0,0 +1,130 @@
+# rag-service/app/core/cache.py
+import hashlib
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+try:  # redis опційний: без нього ембедінги не кешуються між індексаціями
+    import redis.asyncio as aioredis
+
+    REDIS_AVAILABLE = True
+except Exception:  # pragma: no cover - залежність опційна
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """Кеш результатів пошуку за косинусною схожістю ембедінгів запитів.
+
+    Перефразовані запити з схожістю не нижче ``threshold`` повертають
+    збережений результат без повторного пошуку у векторній базі. Записи
+    групуються за ``scope`` (кількість результатів, фільтр), щоб запити з
+    різними параметрами не змішувались. Ембедінги мають бути нормалізовані;
+    зберігаються у float32: матриця невелика, а numpy не має BLAS для
+    float16, тож перетворення або множення у float16 на кожному пошуку
+    коштує більше, ніж економія пам'яті.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1024):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._scopes: Dict[Hashable, Dict[str, Any]] = {}
+
+    def lookup(self, embedding: np.ndarray, scope: Hashable = None) -> Optional[Any]:
+        """Повертає найближчий збережений результат або None"""
+        bucket = self._scopes.get(scope)
+        if not bucket or not bucket["values"]:
+            return None
+
+        if bucket["matrix"] is None:
+            bucket["matrix"] = np.vstack(bucket["embeddings"])
+
+        scores = bucket["matrix"] @ np.asarray(embedding, dtype=np.float32)
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            return bucket["values"][best]
+        return None
+
+    def add(self, embedding: np.ndarray, value: Any, scope: Hashable = None):
+        """Збереження результату для ембедінга запиту"""
+        bucket = self._scopes.setdefault(
+            scope, {"embeddings": [], "values": [], "matrix": None}
+        )
+        if len(bucket["values"]) >= self.max_entries:
+            # Витіснення найстарішого запису (FIFO)
+            bucket["embeddings"].pop(0)
+            bucket["values"].pop(0)
+
+        bucket["embeddings"].append(np.asarray(embedding, dtype=np.float32))
+        bucket["values"].append(value)
+        bucket["matrix"] = None
+
+    def clear(self):
+        """Інвалідація кешу після зміни колекції"""
+        if self._scopes:
+            logger.debug("Семантичний кеш очищено")
+        self._scopes.clear()
+
+    def __len__(self) -> int:
+        return sum(len(b["values"]) for b in self._scopes.values())
+
+class RedisEmbeddingCache:
+    """Кеш ембедінгів чанків у Redis за хешем вмісту.
+
+    Ключ - ``blake2b`` від назви моделі та тексту чанку (без крайових
+    пробілів), значення - сирі байти float16 вектора. Повторна індексація
+    вже баченого документа бере ембедінги з кешу замість моделі. Помилки
+    Redis не зупиняють індексацію: запит вважається промахом.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        model_name: str,
+        ttl: int = 7 * 24 * 3600,
+        prefix: str = "rag:emb:"
+    ):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis не встановлено")
+
+        self.model_name = model_name
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = aioredis.from_url(redis_url, socket_connect_timeout=1.0)
+
+    async def ping(self):
+        """Перевірка з'єднання (кидає виняток, якщо Redis недоступний)"""
+        await self._redis.ping()
+
+    def _key(self, text: str) -> str:
+        digest = hashlib.blake2b(
+            f"{self.model_name}\0{text.strip()}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+        return self.prefix + digest
+
+    async def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Збережені ембедінги (float32) або None для кожного тексту"""
+        try:
+            values = await self._redis.mget([self._key(text) for text in texts])
+        except Exception as e:
+            logger.warning(f"Кеш ембедінгів недоступний: {e}")
+            return [None] * len(texts)
+
+        return [
+            np.frombuffer(value, dtype=np.float16).astype(np.float32) if value else None
+            for value in values
+        ]
+
+    async def set_many(self, texts: Sequence[str], embeddings: np.ndarray):
+        """Збереження ембедінгів одним pipeline"""
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for text, row in zip(texts, embeddings.astype(np.float16)):
+                pipe.set(self._key(text), row.tobytes(), ex=self.ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Не вдалося зберегти ембедінги в кеш: {e}")
+
+    async def close(self):
+        await self._redis.close()
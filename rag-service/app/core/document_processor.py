@@ -4,24 +4,34 @@ This module implements :class:`DocumentProcessor` which is responsible for
 reading files or URLs, extracting their textual content and splitting it into
 chunks ready for embedding and storage in the vector database.  The
 implementation focuses on simplicity and uses common Python libraries such as
-``PyPDF2`` and ``BeautifulSoup`` so that the component can operate in the
-restricted execution environment of the kata.
+``PyPDF2`` and ``selectolax`` (with a regex fallback) so that the component
+can operate in the restricted execution environment of the kata.
 """
 
 from __future__ import annotations
 
-import json
+import asyncio
+import io
 import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
+import httpx
+import numpy as np
+import orjson
 import pandas as pd
+from charset_normalizer import from_bytes
 import requests
-from bs4 import BeautifulSoup
 from markdown import markdown
 import PyPDF2
 
+from ..utils.helpers import extract_html, html_to_text
+
 try:  # DOCX support is optional as ``python-docx`` is fairly heavy
     import docx  # type: ignore
 
@@ -29,9 +39,131 @@ try:  # DOCX support is optional as ``python-docx`` is fairly heavy
 except Exception:  # pragma: no cover - dependency is optional
     DOCX_AVAILABLE = False
 
+try:  # PyMuPDF's C backend extracts text much faster than PyPDF2
+    import fitz  # type: ignore
+
+    PYMUPDF_AVAILABLE = True
+except Exception:  # pragma: no cover - dependency is optional
+    PYMUPDF_AVAILABLE = False
+
+try:  # Arrow's multithreaded C++ reader is much faster than pandas for CSV
+    import pyarrow.csv as pa_csv  # type: ignore
+
+    PYARROW_AVAILABLE = True
+except Exception:  # pragma: no cover - dependency is optional
+    PYARROW_AVAILABLE = False
+
+try:  # Rust-based Excel reader, an order of magnitude faster than openpyxl
+    from python_calamine import CalamineWorkbook  # type: ignore
+
+    CALAMINE_AVAILABLE = True
+except Exception:  # pragma: no cover - dependency is optional
+    CALAMINE_AVAILABLE = False
+
 
 logger = logging.getLogger(__name__)
 
+# PDFs with fewer pages are parsed in-process; spawning workers costs more
+PARALLEL_PDF_MIN_PAGES = 32
+
+# Bytes inspected, from the first invalid UTF-8 byte, when guessing the
+# encoding of a non UTF-8 text file
+ENCODING_SNIFF_BYTES = 64 * 1024
+
+
+@dataclass
+class ChunkBatch:
+    """Chunks of a document stored column-wise.
+
+    ``texts[i]`` and ``metadatas[i]`` describe the same chunk.  The parallel
+    lists match what ``Collection.add`` expects, so no transposition from a
+    list of per-chunk dictionaries is needed before insertion.
+
+    ``input_ids`` holds the embedding model's token ids of each chunk
+    (special tokens included) when the text was chunked by tokens, so the
+    encoder does not have to tokenize the overlapping windows again.  It is
+    empty when the ids are unknown for any chunk of the batch.
+    """
+
+    texts: List[str] = field(default_factory=list)
+    metadatas: List[Dict[str, Any]] = field(default_factory=list)
+    input_ids: List[List[int]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def token_ids(self) -> Optional[List[List[int]]]:
+        """Token ids of every chunk, or ``None`` if they are not known."""
+
+        if self.texts and len(self.input_ids) == len(self.texts):
+            return self.input_ids
+        return None
+
+    def extend(self, other: "ChunkBatch") -> None:
+        """Append the chunks of ``other`` to this batch."""
+
+        if len(self.input_ids) == len(self.texts) and len(other.input_ids) == len(other.texts):
+            self.input_ids.extend(other.input_ids)
+        else:
+            # Ids are only useful for the whole batch; mixed batches re-tokenize
+            self.input_ids = []
+        self.texts.extend(other.texts)
+        self.metadatas.extend(other.metadatas)
+
+
+def _table_to_text(columns: Sequence[Any], rows: Iterable[Sequence[Any]], count: int) -> str:
+    """Render a table as a summary line followed by tab-separated rows.
+
+    Column-width padding (as done by ``DataFrame.to_string``) is skipped as
+    it only adds whitespace that the chunker and the embedder ignore.
+    """
+
+    buf = io.StringIO()
+    buf.write(f"Таблиця містить {count} записів з колонками: {list(columns)}\n")
+    buf.write("\t".join(map(str, columns)))
+    buf.write("\n")
+    for row in rows:
+        buf.write("\t".join("" if value is None else str(value) for value in row))
+        buf.write("\n")
+    return buf.getvalue()
+
+
+def _decode_text(raw: bytes) -> str:
+    """Decode ``raw`` as UTF-8, sniffing the encoding only when that fails.
+
+    The sniffed sample starts at the first byte that is not valid UTF-8: an
+    ASCII prefix says nothing about the encoding of the rest of the file.  A
+    sample that is UTF-8 apart from a few stray bytes keeps UTF-8 (with those
+    bytes replaced); otherwise the detected encoding, then cp1251, must decode
+    the whole file strictly before it is used.
+    """
+
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError as e:
+        sample = raw[e.start:e.start + ENCODING_SNIFF_BYTES]
+
+    invalid = sample.decode("utf-8", errors="replace").count("\ufffd")
+    if invalid > len(sample) // 1024 + 1:
+        best = from_bytes(sample).best()
+        candidates = [best.encoding] if best is not None else []
+        for encoding in candidates + ["cp1251"]:
+            try:
+                return raw.decode(encoding)
+            except (UnicodeDecodeError, LookupError):
+                continue
+    return raw.decode("utf-8", errors="replace")
+
+
+def _extract_pages(pdf_bytes: bytes, start: int, stop: int) -> List[str]:
+    """Extract text of pages ``start``..``stop`` from an in-memory PDF.
+
+    Defined at module level so it can be pickled for a process pool.
+    """
+
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
 
 class DocumentProcessor:
     """Process different document formats and split them into chunks.
@@ -42,11 +174,34 @@ class DocumentProcessor:
         Maximum size of a chunk in characters.
     chunk_overlap:
         Overlap between neighbouring chunks to preserve context.
+    tokenizer_name:
+        Name of a Hugging Face tokenizer (normally the embedding model).  When
+        given, text is split into windows of ``max_tokens`` tokens instead of
+        ``chunk_size`` characters so every chunk fits the embedding model
+        without truncation.  Falls back to character windows if the
+        tokenizer cannot be loaded.
+    max_tokens:
+        Maximum tokens per chunk including the model's special tokens.
+    token_overlap:
+        Overlap between neighbouring token windows.
     """
 
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200) -> None:
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        tokenizer_name: Optional[str] = None,
+        max_tokens: int = 256,
+        token_overlap: int = 32,
+    ) -> None:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.tokenizer_name = tokenizer_name
+        self.max_tokens = max_tokens
+        self.token_overlap = token_overlap
+
+        self._tokenizer: Any = None
+        self._tokenizer_lock = threading.Lock()
 
         # Map file extensions to processing functions
         self.supported_formats: Dict[str, Any] = {
@@ -67,12 +222,11 @@ class DocumentProcessor:
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
-    def process_file(self, file_path: str) -> List[Dict[str, Any]]:
-        """Read ``file_path`` and return a list of text chunks.
+    def process_file(self, file_path: str) -> ChunkBatch:
+        """Read ``file_path`` and return its text chunks.
 
-        Each returned item is a dictionary with keys ``text`` and ``metadata``.
-        ``metadata`` contains basic information about the source such as file
-        name and processing timestamp as well as ``chunk_id`` and
+        Each chunk's metadata contains basic information about the source such
+        as file name and processing timestamp as well as ``chunk_id`` and
         ``total_chunks``.
         """
 
@@ -86,12 +240,14 @@ class DocumentProcessor:
             raise ValueError(f"Unsupported file format: {ext}")
 
         text = processor(str(path))
+        # Timestamp is formatted once per file and shared by all chunks; Chroma
+        # metadata only accepts str/int/float/bool values
         metadata = {
             "source": str(path),
             "filename": path.name,
             "file_type": ext,
             "file_size": path.stat().st_size,
-            "processed_date": datetime.utcnow(),
+            "processed_date": datetime.utcnow().isoformat(),
         }
 
         return self.chunk_text(text, metadata)
@@ -106,22 +262,44 @@ class DocumentProcessor:
 
         response = requests.get(url)
         response.raise_for_status()
+        return self._parse_page(url, response.text)
+
+    async def process_file_async(self, file_path: str) -> ChunkBatch:
+        """Run :meth:`process_file` in a worker thread.
+
+        Parsing and chunking are blocking; offloading them keeps the event
+        loop free to serve other requests during ingestion.
+        """
+
+        return await asyncio.to_thread(self.process_file, file_path)
+
+    async def process_url_async(self, url: str, client: httpx.AsyncClient) -> Dict[str, Any]:
+        """Asynchronous counterpart of :meth:`process_url`.
+
+        The page is fetched with the shared ``client`` so connections are
+        reused, and the HTML is parsed in a worker thread.
+        """
+
+        response = await client.get(url)
+        response.raise_for_status()
+        # Raw bytes go to extract_html, which decodes them once with UnicodeDammit
+        # (BOM, <meta charset>, then detection) before selectolax parses them
+        return await asyncio.to_thread(self._parse_page, url, response.content)
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        text = soup.get_text(separator="\n")
-        title = soup.title.string.strip() if soup.title and soup.title.string else url
+    def _parse_page(self, url: str, html: str | bytes) -> Dict[str, Any]:
+        title, text = extract_html(html)
 
         return {
             "url": url,
-            "title": title,
+            "title": title or url,
             "text": text,
-            "processed_date": datetime.utcnow(),
+            "processed_date": datetime.utcnow().isoformat(),
         }
 
     # ------------------------------------------------------------------
     # Chunking helpers
     # ------------------------------------------------------------------
-    def chunk_text(self, text: str, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def chunk_text(self, text: str, metadata: Dict[str, Any]) -> ChunkBatch:
         """Split ``text`` into chunks preserving a small overlap.
 
         Parameters
@@ -133,65 +311,160 @@ class DocumentProcessor:
         """
 
         if not text:
-            return []
-
-        chunks: List[Dict[str, Any]] = []
-        step = max(self.chunk_size - self.chunk_overlap, 1)
-
-        for start in range(0, len(text), step):
-            chunk_text = text[start : start + self.chunk_size]
-            chunk_meta = metadata.copy()
-            chunk_meta["chunk_id"] = len(chunks)
-            chunks.append({"text": chunk_text, "metadata": chunk_meta})
-
-        total = len(chunks)
-        for item in chunks:
-            item["metadata"]["total_chunks"] = total
+            return ChunkBatch()
+
+        tokenizer = self._get_tokenizer()
+        if tokenizer is not None:
+            spans, input_ids = self._token_windows(text, tokenizer)
+        else:
+            step = max(self.chunk_size - self.chunk_overlap, 1)
+            size = self.chunk_size
+            spans = [(start, start + size) for start in range(0, len(text), step)]
+            input_ids = []
+
+        # The chunk count is known before any metadata is built, so
+        # ``total_chunks`` goes into the shared base instead of a second pass
+        base = {**metadata, "total_chunks": len(spans)}
+        texts = [text[start:end] for start, end in spans]
+        # Dict merge builds each chunk's metadata in a single C-level call
+        metadatas = [{**base, "chunk_id": i} for i in range(len(spans))]
+
+        return ChunkBatch(texts, metadatas, input_ids)
+
+    def _get_tokenizer(self) -> Any:
+        """Lazily load the fast tokenizer; ``None`` disables token chunking."""
+
+        if self.tokenizer_name is None or self._tokenizer is not None:
+            return self._tokenizer
+
+        with self._tokenizer_lock:
+            if self._tokenizer is None and self.tokenizer_name is not None:
+                try:
+                    from transformers import AutoTokenizer
+
+                    self._tokenizer = AutoTokenizer.from_pretrained(
+                        self.tokenizer_name, use_fast=True
+                    )
+                except Exception as exc:
+                    logger.warning(
+                        "Tokenizer %s unavailable, falling back to character chunks: %s",
+                        self.tokenizer_name,
+                        exc,
+                    )
+                    self.tokenizer_name = None
+        return self._tokenizer
+
+    def _token_windows(
+        self, text: str, tokenizer: Any
+    ) -> Tuple[List[Tuple[int, int]], List[List[int]]]:
+        """Character spans and token ids of overlapping windows over ``text``.
+
+        The text is tokenized once; window boundaries are mapped back to
+        character offsets so chunks are exact substrings of the source, and
+        each window's ids are wrapped with the model's special tokens so they
+        can be fed to the encoder as is.
+        """
 
-        return chunks
+        # ``return_tensors="np"`` hands the offsets over from the Rust
+        # tokenizer as one array instead of a list of per-token tuples
+        enc = tokenizer(
+            text,
+            return_offsets_mapping=True,
+            add_special_tokens=False,
+            return_tensors="np",
+            verbose=False,
+        )
+        ids = enc["input_ids"][0]
+        offsets = enc["offset_mapping"][0]
+        n = len(offsets)
+        if n == 0:
+            return [], []
+
+        # Leave room for [CLS]/[SEP] added when the chunk is embedded
+        window = max(self.max_tokens - tokenizer.num_special_tokens_to_add(), 1)
+        step = max(window - self.token_overlap, 1)
+        starts = np.arange(0, max(n - self.token_overlap, 1), step)
+        stops = np.minimum(starts + window, n)
+        spans = list(zip(offsets[starts, 0].tolist(), offsets[stops - 1, 1].tolist()))
+        input_ids = [
+            tokenizer.build_inputs_with_special_tokens(ids[start:stop].tolist())
+            for start, stop in zip(starts.tolist(), stops.tolist())
+        ]
+        return spans, input_ids
 
     # ------------------------------------------------------------------
     # Processing helpers for individual file types
     # ------------------------------------------------------------------
     def _process_pdf(self, file_path: str) -> str:
-        text_parts: List[str] = []
+        if PYMUPDF_AVAILABLE:
+            with fitz.open(file_path) as doc:
+                return "\n".join(page.get_text("text") for page in doc)
+
+        # PyPDF2 fallback: large PDFs are split across worker processes
         with open(file_path, "rb") as fh:
-            reader = PyPDF2.PdfReader(fh)
-            for page in reader.pages:
-                text_parts.append(page.extract_text() or "")
-        return "\n".join(text_parts)
+            data = fh.read()
+
+        num_pages = len(PyPDF2.PdfReader(io.BytesIO(data)).pages)
+        workers = min(os.cpu_count() or 1, num_pages // PARALLEL_PDF_MIN_PAGES)
+        if workers <= 1:
+            return "\n".join(_extract_pages(data, 0, num_pages))
+
+        # One contiguous page range per worker keeps results in page order
+        bounds = [num_pages * i // workers for i in range(workers + 1)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(
+                _extract_pages, [data] * workers, bounds[:-1], bounds[1:]
+            )
+            return "\n".join(text for part in parts for text in part)
 
     def _process_txt(self, file_path: str) -> str:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as fh:
-            return fh.read()
+        return _decode_text(Path(file_path).read_bytes())
 
     def _process_markdown(self, file_path: str) -> str:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as fh:
-            html = markdown(fh.read())
-        soup = BeautifulSoup(html, "html.parser")
-        return soup.get_text()
+        text = _decode_text(Path(file_path).read_bytes())
+        return html_to_text(markdown(text))
 
     def _process_html(self, file_path: str) -> str:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as fh:
-            soup = BeautifulSoup(fh.read(), "html.parser")
-        return soup.get_text()
+        # Raw bytes let the parser honour the document's declared charset
+        return html_to_text(Path(file_path).read_bytes())
 
     def _process_csv(self, file_path: str) -> str:
+        if PYARROW_AVAILABLE:
+            table = pa_csv.read_csv(file_path)
+            rows = (
+                row
+                for batch in table.to_batches()
+                for row in zip(*(column.to_pylist() for column in batch.columns))
+            )
+            return _table_to_text(table.column_names, rows, table.num_rows)
+
         df = pd.read_csv(file_path)
-        text = f"Таблиця містить {len(df)} записів з колонками: {list(df.columns)}\n"
-        text += df.to_string(index=False)
-        return text
+        return _table_to_text(df.columns, df.itertuples(index=False), len(df))
 
     def _process_excel(self, file_path: str) -> str:
-        df = pd.read_excel(file_path)
-        text = f"Таблиця містить {len(df)} записів з колонками: {list(df.columns)}\n"
-        text += df.to_string(index=False)
-        return text
+        # Every sheet comes from a single open of the workbook
+        tables: List[Tuple[str, str]] = []
+        if CALAMINE_AVAILABLE:
+            workbook = CalamineWorkbook.from_path(file_path)
+            for name in workbook.sheet_names:
+                rows = workbook.get_sheet_by_name(name).to_python()
+                if rows:
+                    tables.append((name, _table_to_text(rows[0], rows[1:], len(rows) - 1)))
+        else:
+            for name, df in pd.read_excel(file_path, sheet_name=None).items():
+                if len(df.columns):
+                    tables.append(
+                        (name, _table_to_text(df.columns, df.itertuples(index=False), len(df)))
+                    )
+
+        if len(tables) == 1:
+            return tables[0][1]
+        return "\n".join(f"Аркуш {name}:\n{text}" for name, text in tables)
 
     def _process_json(self, file_path: str) -> str:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as fh:
-            data = json.load(fh)
-        return json.dumps(data, ensure_ascii=False, indent=2)
+        # Compact output: indentation only adds whitespace for the embedder
+        data = orjson.loads(Path(file_path).read_bytes())
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
 
     def _process_docx(self, file_path: str) -> str:
         if not DOCX_AVAILABLE:  # pragma: no cover - safety check
@@ -200,5 +473,5 @@ class DocumentProcessor:
         return "\n".join(p.text for p in document.paragraphs)
 
 
-__all__ = ["DocumentProcessor"]
+__all__ = ["ChunkBatch", "DocumentProcessor"]
 
@@ -0,0 +1,108 @@
+# rag-service/app/core/embeddings.py
+import asyncio
+from typing import Callable, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbedBatcher:
+    """Динамічне батчування запитів на ембедінги.
+
+    Паралельні виклики ``embed`` (пошук, додавання, оновлення) складаються в
+    чергу; фонова задача забирає їх, поки не набере ``max_batch`` текстів або
+    не мине ``max_wait`` секунд, і виконує один виклик ``encode_fn`` в
+    executor. Результати розподіляються між очікуючими future.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch: int = 128,
+        max_wait: float = 0.01
+    ):
+        self._encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запуск фонової задачі батчування"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Зупинка фонової задачі"""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Очікуючі запити більше не будуть оброблені
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("EmbedBatcher зупинено"))
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Ембедінги для ``texts`` (рядок на текст)"""
+        if self._task is None:
+            raise RuntimeError("EmbedBatcher не запущено")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[List[str], asyncio.Future]]:
+        """Збір запитів з черги до max_batch текстів або max_wait"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+
+        while size < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = [text for item_texts, _ in batch for text in item_texts]
+
+            try:
+                embeddings = await loop.run_in_executor(None, self._encode_fn, texts)
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("EmbedBatcher зупинено"))
+                raise
+            except Exception as e:
+                logger.error(f"Помилка генерації ембедінгів: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(embeddings[offset:offset + len(item_texts)])
+                offset += len(item_texts)
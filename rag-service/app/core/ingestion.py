@@ -0,0 +1,116 @@
+# rag-service/app/core/ingestion.py
+import asyncio
+import uuid
+from typing import TYPE_CHECKING, List, Optional, Tuple
+import logging
+
+from .document_processor import ChunkBatch
+
+if TYPE_CHECKING:  # rag_engine тягне chromadb і torch
+    from .rag_engine import RAGEngine
+
+logger = logging.getLogger(__name__)
+
+class IngestionQueue:
+    """Черга індексації чанків.
+
+    Обробники файлів та URL кладуть чанки в чергу, а одна фонова задача
+    накопичує їх з різних документів до ``batch_size`` чанків (або до
+    ``flush_interval`` секунд), рахує ембедінги одним викликом
+    ``encode_batch`` і записує в колекцію одним батчем. Великі рідкі записи
+    в ChromaDB значно дешевші за багато дрібних.
+
+    ``put`` повертає future, що завершується, коли батч з чанками документа
+    записано (або з помилкою батчу), тож обробник задачі може дочекатися
+    запису і передати помилку в повтори/DLQ черги задач.
+    """
+
+    def __init__(self, engine: "RAGEngine", batch_size: int = 200, flush_interval: float = 1.0):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запуск фонової задачі запису"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Запис залишку черги та зупинка"""
+        if self._task is None:
+            return
+
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def put(self, chunks: ChunkBatch) -> asyncio.Future:
+        """Додавання чанків документа до черги.
+
+        Повертає future, яка отримує результат (``None``) після запису
+        батчу в колекцію або виняток, якщо батч записати не вдалося.
+        """
+        if self._task is None:
+            raise RuntimeError("IngestionQueue не запущено")
+        committed = asyncio.get_running_loop().create_future()
+        await self._queue.put((chunks, committed))
+        return committed
+
+    async def _collect(self) -> Tuple[ChunkBatch, List[asyncio.Future]]:
+        """Збір чанків до batch_size або flush_interval"""
+        loop = asyncio.get_running_loop()
+        batch = ChunkBatch()
+        chunks, committed = await self._queue.get()
+        batch.extend(chunks)
+        futures = [committed]
+        deadline = loop.time() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                chunks, committed = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.extend(chunks)
+            futures.append(committed)
+
+        return batch, futures
+
+    async def _run(self):
+        while True:
+            batch, futures = await self._collect()
+            try:
+                embeddings = await self.engine.encode_batch(batch.texts, batch.token_ids())
+                await self.engine.add_documents_batch(
+                    [uuid.uuid4().hex for _ in range(len(batch))],
+                    batch.texts,
+                    batch.metadatas,
+                    embeddings
+                )
+            except asyncio.CancelledError:
+                for committed in futures:
+                    if not committed.done():
+                        committed.set_exception(RuntimeError("IngestionQueue зупинено"))
+                raise
+            except Exception as e:
+                sources = sorted({m.get("source", "") for m in batch.metadatas})
+                logger.error(f"Помилка індексації батчу з {len(batch)} чанків ({sources}): {e}")
+                for committed in futures:
+                    if not committed.done():
+                        committed.set_exception(e)
+            else:
+                for committed in futures:
+                    if not committed.done():
+                        committed.set_result(None)
+            finally:
+                for _ in futures:
+                    self._queue.task_done()
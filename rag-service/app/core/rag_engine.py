@@ -1,19 +1,45 @@
 # rag-service/app/core/rag_engine.py
 import asyncio
+import functools
+import json
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Union
 import logging
 from datetime import datetime
 
 import chromadb
 from chromadb.config import Settings
+from cachetools import LRUCache
 from sentence_transformers import SentenceTransformer
+from sentence_transformers.util import batch_to_device
 import numpy as np
+import torch
 
 from ..models.document import SearchResult
+from .cache import REDIS_AVAILABLE, RedisEmbeddingCache, SemanticCache
+from .document_processor import ChunkBatch
+from .embeddings import EmbedBatcher
+from .vector_index import FAISS_AVAILABLE, FaissIndex, NumpyIndex, warmup_kernels
 
 logger = logging.getLogger(__name__)
 
+# Розмір батчу для генерації ембедінгів за замовчуванням
+ENCODE_BATCH_SIZE = 128
+
+# Максимум записів в одному виклику collection.add
+ADD_BATCH_SIZE = 1000
+
+# Розмір сторінки при читанні метаданих колекції
+METADATA_PAGE_SIZE = 10_000
+
+def _clamp_score(score: float) -> float:
+    """Схожість у межах [0, 1], як вимагає ``SearchResult.score``.
+
+    Скалярний добуток нормалізованих векторів може трохи вийти за 1 через
+    округлення (або квантизацію індексу), а косинусна схожість буває від'ємною.
+    """
+    return min(max(score, 0.0), 1.0)
+
 class RAGEngine:
     """Основний клас для RAG операцій"""
     
@@ -21,28 +47,67 @@ class RAGEngine:
         self,
         db_path: str = "/app/vector_db",
         embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
-        collection_name: str = "documents"
+        collection_name: str = "documents",
+        semantic_cache_threshold: float = 0.95,
+        semantic_cache_size: int = 1024,
+        embedding_backend: str = "onnx",
+        onnx_file_name: str = "onnx/model_O3.onnx",
+        embedding_batch_size: int = ENCODE_BATCH_SIZE,
+        vector_index: str = "faiss",
+        vector_index_dtype: str = "float16",
+        redis_url: Optional[str] = None,
+        embedding_cache_ttl: int = 7 * 24 * 3600
     ):
         self.db_path = db_path
         self.embedding_model_name = embedding_model
         self.collection_name = collection_name
+        self.embedding_backend = embedding_backend
+        self.onnx_file_name = onnx_file_name
+        self.embedding_batch_size = embedding_batch_size
+        self.vector_index = vector_index
+        self.vector_index_dtype = vector_index_dtype
+        self.redis_url = redis_url
+        self.embedding_cache_ttl = embedding_cache_ttl
         
         self.client = None
         self.collection = None
         self.encoder = None
         self._ready = False
+        
+        # In-process дзеркало колекції для пошуку (None - лише ChromaDB)
+        self._index: Optional[Union[FaissIndex, NumpyIndex]] = None
+        
+        # Унікальні джерела, підтримуються при додаванні/видаленні
+        self._sources: Set[str] = set()
+        
+        # Об'єднання паралельних викликів encode в один батч
+        self._batcher = EmbedBatcher(self._encode, max_batch=embedding_batch_size)
+        
+        # Кеш ембедінгів для точних повторів запитів (float32, як і перший
+        # запит, щоб повтори давали ті самі оцінки)
+        self._q_cache: LRUCache = LRUCache(maxsize=10_000)
+        
+        # Кеш ембедінгів чанків у Redis для повторної індексації
+        self._emb_cache: Optional[RedisEmbeddingCache] = None
+        
+        # Кеш результатів для перефразованих запитів
+        self._sem_cache = SemanticCache(
+            threshold=semantic_cache_threshold,
+            max_entries=semantic_cache_size
+        )
     
     async def initialize(self):
         """Ініціалізація RAG engine"""
         try:
             logger.info("Завантаження моделі ембедінгів...")
             # Завантаження в окремому потоці
+            device = "cuda" if torch.cuda.is_available() else "cpu"
             loop = asyncio.get_event_loop()
-            self.encoder = await loop.run_in_executor(
-                None, 
-                SentenceTransformer, 
-                self.embedding_model_name
-            )
+            self.encoder = await loop.run_in_executor(None, self._load_encoder, device)
+            
+            # Прогрів моделі, щоб перший запит не платив за компіляцію
+            warmup = await loop.run_in_executor(None, self._encode, ["warmup"] * 4)
+            self._batcher.start()
             
             logger.info("Ініціалізація локальної ChromaDB...")
             self.client = chromadb.PersistentClient(
@@ -56,6 +121,37 @@ class RAGEngine:
                 metadata={"hnsw:space": "cosine"}
             )
             
+            # Прогрів колекції: HNSW індекс завантажується з диску ліниво,
+            # тож пробний запит переносить цю затримку на старт сервісу
+            if self.collection.count() > 0:
+                self.collection.query(query_embeddings=[warmup[0].tolist()], n_results=1)
+            
+            if self.vector_index == "faiss" and FAISS_AVAILABLE:
+                self._index = FaissIndex(warmup.shape[1], dtype=self.vector_index_dtype)
+            elif self.vector_index in ("faiss", "numpy"):
+                if self.vector_index == "faiss":
+                    logger.warning("faiss не встановлено, використовується numpy індекс")
+                if self.vector_index_dtype == "float16":
+                    logger.warning(
+                        "NumpyIndex з float16 шукає повільніше (немає BLAS для float16), "
+                        "для нього краще VECTOR_INDEX_DTYPE=int8 або float32"
+                    )
+                self._index = NumpyIndex(warmup.shape[1], dtype=self.vector_index_dtype)
+                await loop.run_in_executor(None, warmup_kernels)
+            
+            await loop.run_in_executor(None, self._load_collection)
+            
+            if self.redis_url and REDIS_AVAILABLE:
+                cache = RedisEmbeddingCache(
+                    self.redis_url, self.embedding_model_name, ttl=self.embedding_cache_ttl
+                )
+                try:
+                    await cache.ping()
+                    self._emb_cache = cache
+                except Exception as e:
+                    logger.warning(f"Redis недоступний, кеш ембедінгів вимкнено: {e}")
+                    await cache.close()
+            
             self._ready = True
             logger.info(f"RAG Engine ініціалізовано. Колекція: {self.collection_name}")
             
@@ -63,11 +159,181 @@ class RAGEngine:
             logger.error(f"Помилка ініціалізації RAG Engine: {e}")
             raise
     
+    def _load_encoder(self, device: str) -> SentenceTransformer:
+        """Завантаження моделі ембедінгів з урахуванням бекенду"""
+        if device == "cpu" and self.embedding_backend in ("onnx", "openvino"):
+            try:
+                model_kwargs = {"file_name": self.onnx_file_name}
+                if self.embedding_backend == "onnx":
+                    model_kwargs["provider"] = "CPUExecutionProvider"
+                encoder = SentenceTransformer(
+                    self.embedding_model_name,
+                    device=device,
+                    backend=self.embedding_backend,
+                    model_kwargs=model_kwargs
+                )
+                logger.info(f"Модель ембедінгів завантажено з бекендом {self.embedding_backend}")
+                return encoder
+            except Exception as e:
+                logger.warning(
+                    f"Не вдалося завантажити бекенд {self.embedding_backend}, "
+                    f"використовується torch: {e}"
+                )
+        
+        encoder = SentenceTransformer(self.embedding_model_name, device=device)
+        if device == "cuda":
+            # fp16 на GPU: ~2x пропускна здатність без втрати якості пошуку
+            encoder.half()
+            try:
+                encoder[0].auto_model = torch.compile(
+                    encoder[0].auto_model, mode="reduce-overhead", fullgraph=False
+                )
+            except Exception as e:
+                logger.warning(f"torch.compile недоступний, модель без компіляції: {e}")
+        logger.info(f"Модель ембедінгів завантажено на {device}")
+        return encoder
+    
+    def _load_collection(self):
+        """Посторінкове читання колекції: джерела та in-process дзеркало"""
+        include = ["metadatas"]
+        if self._index is not None:
+            include += ["documents", "embeddings"]
+        
+        self._sources = set()
+        offset = 0
+        while True:
+            page = self.collection.get(
+                include=include, limit=METADATA_PAGE_SIZE, offset=offset
+            )
+            metadatas = page.get("metadatas") or []
+            self._sources.update(m["source"] for m in metadatas if m and "source" in m)
+            if self._index is not None and metadatas:
+                self._index.add(
+                    page["ids"],
+                    page["documents"],
+                    metadatas,
+                    np.asarray(page["embeddings"], dtype=np.float32)
+                )
+            if len(metadatas) < METADATA_PAGE_SIZE:
+                break
+            offset += METADATA_PAGE_SIZE
+        
+        if self._index is not None:
+            logger.info(
+                f"{type(self._index).__name__} завантажено: {len(self._index)} векторів"
+            )
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Нормалізовані ембедінги (виконується в executor)"""
+        return self.encoder.encode(
+            texts,
+            batch_size=self.embedding_batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+    
+    def _encode_ids(self, input_ids: List[List[int]]) -> np.ndarray:
+        """Нормалізовані ембедінги для вже токенізованих чанків (в executor)"""
+        tokenizer = self.encoder.tokenizer
+        # Сортування за довжиною зменшує padding у батчах
+        order = np.argsort([-len(ids) for ids in input_ids], kind="stable")
+        embeddings = np.empty(
+            (len(input_ids), self.encoder.get_sentence_embedding_dimension()),
+            dtype=np.float32
+        )
+        
+        with torch.inference_mode():
+            for i in range(0, len(order), self.embedding_batch_size):
+                idx = order[i:i + self.embedding_batch_size]
+                features = tokenizer.pad(
+                    {"input_ids": [input_ids[j] for j in idx]}, return_tensors="pt"
+                )
+                if "token_type_ids" in tokenizer.model_input_names:
+                    features["token_type_ids"] = torch.zeros_like(features["input_ids"])
+                features = batch_to_device(dict(features), self.encoder.device)
+                out = self.encoder.forward(features)["sentence_embedding"]
+                out = torch.nn.functional.normalize(out.float(), p=2, dim=1)
+                embeddings[idx] = out.cpu().numpy()
+        
+        return embeddings
+    
+    async def encode_batch(
+        self,
+        texts: List[str],
+        input_ids: Optional[List[List[int]]] = None
+    ) -> np.ndarray:
+        """Ембедінги для великого батчу текстів одним викликом encode.
+        
+        Для масової індексації: минає EmbedBatcher, щоб сотні чанків не
+        затримували дрібні запити пошуку в його черзі. Якщо чанкер уже
+        токенізував тексти (``input_ids``), повторна токенізація вікон
+        з перекриттям пропускається. Чанки, вже збережені в Redis кеші,
+        не перераховуються.
+        """
+        if not self.is_ready():
+            raise RuntimeError("RAG Engine не ініціалізовано")
+        
+        if self._emb_cache is None:
+            return await self._encode_uncached(texts, input_ids)
+        
+        cached = await self._emb_cache.get_many(texts)
+        misses = [i for i, emb in enumerate(cached) if emb is None]
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            fresh = await self._encode_uncached(
+                miss_texts,
+                [input_ids[i] for i in misses] if input_ids is not None else None
+            )
+            await self._emb_cache.set_many(miss_texts, fresh)
+            for i, emb in zip(misses, fresh):
+                cached[i] = emb
+        
+        if len(misses) < len(texts):
+            logger.info(f"Ембедінги {len(texts) - len(misses)} з {len(texts)} чанків взято з кешу")
+        return np.vstack(cached)
+    
+    async def _encode_uncached(
+        self,
+        texts: List[str],
+        input_ids: Optional[List[List[int]]] = None
+    ) -> np.ndarray:
+        """Обчислення ембедінгів моделлю в executor"""
+        loop = asyncio.get_running_loop()
+        if input_ids is not None:
+            try:
+                return await loop.run_in_executor(None, self._encode_ids, input_ids)
+            except Exception as e:
+                logger.warning(f"Ембедінги з токенів недоступні, токенізація текстів: {e}")
+        return await loop.run_in_executor(None, self._encode, texts)
+    
+    async def _run_sync(self, fn, *args, **kwargs):
+        """Виклик синхронного API ChromaDB в executor, щоб не блокувати event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+    
+    def _add_to_collection(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: np.ndarray
+    ):
+        """Додавання до колекції обмеженими батчами (виконується в executor)"""
+        # ChromaDB 0.4 приймає ембедінги лише списками
+        for i in range(0, len(documents), ADD_BATCH_SIZE):
+            self.collection.add(
+                embeddings=embeddings[i:i + ADD_BATCH_SIZE].tolist(),
+                documents=documents[i:i + ADD_BATCH_SIZE],
+                metadatas=metadatas[i:i + ADD_BATCH_SIZE],
+                ids=ids[i:i + ADD_BATCH_SIZE]
+            )
+    
     def is_ready(self) -> bool:
         """Перевірка готовності engine"""
         return self._ready and self.client is not None and self.encoder is not None
     
-    async def add_documents(self, chunks: List[Dict[str, Any]]):
+    async def add_documents(self, chunks: ChunkBatch):
         """Додавання документів до векторної бази"""
         if not self.is_ready():
             raise RuntimeError("RAG Engine не ініціалізовано")
@@ -76,28 +342,39 @@ class RAGEngine:
             return
         
         try:
-            texts = [chunk['text'] for chunk in chunks]
-            metadatas = [chunk['metadata'] for chunk in chunks]
-            ids = [str(uuid.uuid4()) for _ in chunks]
+            texts = chunks.texts
+            ids = [uuid.uuid4().hex for _ in range(len(texts))]
             
             logger.info(f"Генерація ембедінгів для {len(texts)} текстів...")
             
-            # Генерація ембедінгів в окремому потоці
-            loop = asyncio.get_event_loop()
-            embeddings = await loop.run_in_executor(
-                None,
-                lambda: self.encoder.encode(texts, show_progress_bar=False).tolist()
-            )
+            # Ембедінги рахуються тут, а не вбудованою функцією ChromaDB
+            embeddings = await self.encode_batch(texts, chunks.token_ids())
             
-            # Додавання до колекції
-            self.collection.add(
-                embeddings=embeddings,
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids
-            )
+            await self.add_documents_batch(ids, texts, chunks.metadatas, embeddings)
             
-            logger.info(f"Додано {len(chunks)} чанків до колекції {self.collection_name}")
+        except Exception as e:
+            logger.error(f"Помилка додавання документів: {e}")
+            raise
+    
+    async def add_documents_batch(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        embeddings: np.ndarray
+    ):
+        """Запис готових чанків з обчисленими ембедінгами в колекцію"""
+        if not self.is_ready():
+            raise RuntimeError("RAG Engine не ініціалізовано")
+        
+        try:
+            await self._run_sync(self._add_to_collection, ids, documents, metadatas, embeddings)
+            if self._index is not None:
+                self._index.add(ids, documents, metadatas, embeddings)
+            self._sem_cache.clear()
+            self._sources.update(m["source"] for m in metadatas if "source" in m)
+            
+            logger.info(f"Додано {len(documents)} чанків до колекції {self.collection_name}")
             
         except Exception as e:
             logger.error(f"Помилка додавання документів: {e}")
@@ -116,34 +393,53 @@ class RAGEngine:
         try:
             logger.info(f"Пошук для запиту: '{query}'")
             
-            # Генерація ембедінга запиту
-            loop = asyncio.get_event_loop()
-            query_embedding = await loop.run_in_executor(
-                None,
-                lambda: self.encoder.encode([query], show_progress_bar=False).tolist()
-            )
+            # Генерація ембедінга запиту (повтори беруться з LRU кешу)
+            query_embedding = self._q_cache.get(query)
+            if query_embedding is None:
+                query_embedding = (await self._batcher.embed([query]))[0]
+                self._q_cache[query] = query_embedding
+            
+            # Перевірка семантичного кешу
+            cache_scope = (n_results, json.dumps(filter_metadata, sort_keys=True, default=str))
+            cached = self._sem_cache.lookup(query_embedding, cache_scope)
+            if cached is not None:
+                logger.info(f"Результат для запиту '{query}' взято з семантичного кешу")
+                return cached
+            
+            # Гарячий шлях: in-process індекс (фільтри метаданих - через ChromaDB)
+            if self._index is not None and not filter_metadata:
+                search_results = [
+                    SearchResult(text=doc, metadata=meta, score=_clamp_score(score), id=doc_id)
+                    for doc_id, doc, meta, score in self._index.search(query_embedding, n_results)
+                ]
+                self._sem_cache.add(query_embedding, search_results, cache_scope)
+                
+                logger.info(f"Знайдено {len(search_results)} результатів")
+                return search_results
             
             # Пошук у ChromaDB
             search_kwargs = {
-                "query_embeddings": query_embedding,
+                "query_embeddings": [query_embedding.tolist()],
                 "n_results": n_results
             }
             
             if filter_metadata:
                 search_kwargs["where"] = filter_metadata
             
-            results = self.collection.query(**search_kwargs)
+            results = await self._run_sync(self.collection.query, **search_kwargs)
             
-            # Форматування результатів
-            search_results = []
+            # Форматування результатів (cosine distance -> score)
+            search_results = [
+                SearchResult(text=doc, metadata=meta, score=_clamp_score(1.0 - dist), id=doc_id)
+                for doc, meta, dist, doc_id in zip(
+                    results['documents'][0],
+                    results['metadatas'][0],
+                    results['distances'][0],
+                    results['ids'][0]
+                )
+            ]
             
-            for i in range(len(results['documents'][0])):
-                search_results.append(SearchResult(
-                    text=results['documents'][0][i],
-                    metadata=results['metadatas'][0][i],
-                    score=1.0 - results['distances'][0][i],  # Конвертація distance в score
-                    id=results['ids'][0][i] if 'ids' in results else str(i)
-                ))
+            self._sem_cache.add(query_embedding, search_results, cache_scope)
             
             logger.info(f"Знайдено {len(search_results)} результатів")
             return search_results
@@ -158,7 +454,7 @@ class RAGEngine:
             raise RuntimeError("RAG Engine не ініціалізовано")
         
         try:
-            count = self.collection.count()
+            count = await self._run_sync(self.collection.count)
             return {
                 "collection_name": self.collection_name,
                 "count": count,
@@ -175,11 +471,16 @@ class RAGEngine:
         
         try:
             # Видалення колекції та створення нової
-            self.client.delete_collection(self.collection_name)
-            self.collection = self.client.create_collection(
+            await self._run_sync(self.client.delete_collection, self.collection_name)
+            self.collection = await self._run_sync(
+                self.client.create_collection,
                 name=self.collection_name,
                 metadata={"hnsw:space": "cosine"}
             )
+            if self._index is not None:
+                self._index.reset()
+            self._sem_cache.clear()
+            self._sources.clear()
             logger.info(f"Колекція {self.collection_name} очищена")
         except Exception as e:
             logger.error(f"Помилка очищення колекції: {e}")
@@ -191,15 +492,7 @@ class RAGEngine:
             raise RuntimeError("RAG Engine не ініціалізовано")
         
         try:
-            # Отримання всіх метаданих
-            results = self.collection.get()
-            
-            sources = set()
-            for metadata in results.get('metadatas', []):
-                if 'source' in metadata:
-                    sources.add(metadata['source'])
-            
-            return sorted(list(sources))
+            return sorted(self._sources)
             
         except Exception as e:
             logger.error(f"Помилка отримання джерел: {e}")
@@ -212,10 +505,16 @@ class RAGEngine:
         
         try:
             # Пошук документів за джерелом
-            results = self.collection.get(where={"source": source})
+            results = await self._run_sync(
+                self.collection.get, where={"source": source}, include=[]
+            )
             
             if results['ids']:
-                self.collection.delete(ids=results['ids'])
+                await self._run_sync(self.collection.delete, ids=results['ids'])
+                if self._index is not None:
+                    self._index.remove(results['ids'])
+                self._sem_cache.clear()
+                self._sources.discard(source)
                 logger.info(f"Видалено {len(results['ids'])} документів з джерела {source}")
             else:
                 logger.info(f"Документів з джерела {source} не знайдено")
@@ -230,7 +529,7 @@ class RAGEngine:
             raise RuntimeError("RAG Engine не ініціалізовано")
         
         try:
-            results = self.collection.get(ids=[doc_id])
+            results = await self._run_sync(self.collection.get, ids=[doc_id])
             
             if results['ids']:
                 return {
@@ -252,19 +551,21 @@ class RAGEngine:
         
         try:
             # Генерація нового ембедінга
-            loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
-                None,
-                lambda: self.encoder.encode([text], show_progress_bar=False).tolist()[0]
-            )
+            embedding = (await self._batcher.embed([text]))[0]
             
             # Оновлення в колекції
-            self.collection.update(
+            await self._run_sync(
+                self.collection.update,
                 ids=[doc_id],
-                embeddings=[embedding],
+                embeddings=[embedding.tolist()],
                 documents=[text],
                 metadatas=[metadata]
             )
+            if self._index is not None:
+                self._index.add([doc_id], [text], [metadata], embedding[None, :])
+            self._sem_cache.clear()
+            if "source" in metadata:
+                self._sources.add(metadata["source"])
             
             logger.info(f"Документ {doc_id} оновлено")
             
@@ -275,6 +576,10 @@ class RAGEngine:
     async def close(self):
         """Закриття з'єднань"""
         try:
+            await self._batcher.stop()
+            if self._emb_cache is not None:
+                await self._emb_cache.close()
+                self._emb_cache = None
             # ChromaDB HTTP client не потребує явного закриття
             self.client = None
             self.collection = None
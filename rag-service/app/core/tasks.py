@@ -0,0 +1,134 @@
+# rag-service/app/core/tasks.py
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+import orjson
+
+try:  # arq опційний: без нього обробка йде локальними фоновими задачами
+    from arq import create_pool
+    from arq.connections import ArqRedis, RedisSettings
+    from arq.worker import Retry, Worker, func
+
+    ARQ_AVAILABLE = True
+except Exception:  # pragma: no cover - залежність опційна
+    ARQ_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Redis список для задач, що вичерпали всі спроби
+DLQ_KEY = "rag:ingest:dlq"
+
+# Базова затримка між повторами (множиться на номер спроби)
+RETRY_BACKOFF = 5.0
+
+# Запас до job_timeout arq: обробник зупиняється раніше, щоб задача пішла
+# в повтор/DLQ, а не була просто скасована arq
+JOB_TIMEOUT_MARGIN = 10.0
+
+Handler = Callable[..., Awaitable[Any]]
+
+class TaskQueue:
+    """Надійна черга задач обробки документів на Redis (arq).
+
+    Ендпоінти ставлять задачі в Redis, а воркер arq, запущений у цьому ж
+    процесі (йому потрібні модель і колекція RAG engine), виконує до
+    ``max_jobs`` з них паралельно на event loop. Невдалі задачі
+    повторюються з лінійною затримкою, а після ``max_tries`` спроб
+    потрапляють у DLQ (``DLQ_KEY``) замість того, щоб загубитись.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        handlers: Dict[str, Handler],
+        max_jobs: int = 16,
+        job_timeout: int = 300,
+        max_tries: int = 3
+    ):
+        if not ARQ_AVAILABLE:
+            raise RuntimeError("arq не встановлено")
+
+        self.redis_url = redis_url
+        self.handlers = handlers
+        self.max_jobs = max_jobs
+        self.job_timeout = job_timeout
+        self.handler_timeout = job_timeout - min(JOB_TIMEOUT_MARGIN, job_timeout / 2)
+        self.max_tries = max_tries
+        self._redis: Optional[ArqRedis] = None
+        self._worker: Optional[Worker] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Підключення до Redis та запуск воркера"""
+        redis_settings = RedisSettings.from_dsn(self.redis_url)
+        # Без Redis сервіс стартує з локальними задачами, тож не чекаємо довго
+        redis_settings.conn_retries = 1
+        self._redis = await create_pool(redis_settings)
+        self._worker = Worker(
+            functions=[
+                func(self._wrap(name, handler), name=name, max_tries=self.max_tries)
+                for name, handler in self.handlers.items()
+            ],
+            redis_pool=self._redis,
+            max_jobs=self.max_jobs,
+            job_timeout=self.job_timeout,
+            handle_signals=False
+        )
+        self._task = asyncio.create_task(self._worker.async_run())
+        logger.info(f"Черга задач arq запущена (max_jobs={self.max_jobs})")
+
+    async def stop(self):
+        """Зупинка воркера; незавершені задачі лишаються в Redis"""
+        if self._worker is not None:
+            await self._worker.close()
+            self._worker = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    async def enqueue(self, name: str, *args: Any):
+        """Постановка задачі в чергу"""
+        if self._redis is None:
+            raise RuntimeError("TaskQueue не запущено")
+        await self._redis.enqueue_job(name, *args)
+
+    def _wrap(self, name: str, handler: Handler):
+        """Задача arq: повтор з затримкою, після останньої спроби - DLQ.
+
+        Таймаут обробника перевіряється тут, а не лише arq: скасування
+        по job_timeout не є ``Exception`` і обійшло б повтори та DLQ.
+        """
+        async def job(ctx: Dict[str, Any], *args: Any):
+            try:
+                return await asyncio.wait_for(handler(*args), self.handler_timeout)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    error = f"перевищено час виконання {self.handler_timeout:.0f} с"
+                else:
+                    error = str(e)
+                job_try = ctx["job_try"]
+                if job_try < self.max_tries:
+                    logger.warning(f"Задача {name}{args} невдала (спроба {job_try}): {error}")
+                    raise Retry(defer=RETRY_BACKOFF * job_try)
+
+                logger.error(f"Задача {name}{args} переміщена в DLQ після {job_try} спроб: {error}")
+                await self._redis.rpush(DLQ_KEY, orjson.dumps({
+                    "job_id": ctx["job_id"],
+                    "function": name,
+                    "args": args,
+                    "error": error,
+                    "tries": job_try,
+                    "failed_at": time.time()
+                }))
+
+        job.__qualname__ = name
+        return job
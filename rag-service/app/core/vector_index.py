@@ -0,0 +1,407 @@
+# rag-service/app/core/vector_index.py
+from typing import Any, Dict, List, Sequence, Tuple
+import logging
+
+import numpy as np
+
+try:  # FAISS опційний: без нього використовується NumpyIndex
+    import faiss  # type: ignore
+
+    FAISS_AVAILABLE = True
+except Exception:  # pragma: no cover - залежність опційна
+    FAISS_AVAILABLE = False
+
+try:  # Numba опційний: без нього top-k рахується через numpy
+    from numba import njit, prange
+
+    NUMBA_AVAILABLE = True
+except Exception:  # pragma: no cover - залежність опційна
+    NUMBA_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# (id, текст, метадані, схожість)
+IndexHit = Tuple[str, str, Dict[str, Any], float]
+
+# Від скількох векторів скоринг іде паралельним ядром Numba; на менших
+# матрицях накладні витрати потоків більші за виграш, і GEMV з BLAS швидший
+PARALLEL_MIN_ROWS = 16384
+
+# Типи зберігання ембедінгів in-process індексу
+INDEX_DTYPES = ("float32", "float16", "int8")
+
+# Рядків на блок при скорингу без ядра Numba (float16 / int8 без Numba):
+# тимчасова float32 копія блоку вміщується в кеш замість копії всієї матриці
+SCORE_BLOCK_ROWS = 4096
+
+def _topk_numpy(scores: np.ndarray, k: int) -> np.ndarray:
+    """Індекси ``k`` найбільших значень ``scores`` за спаданням"""
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+    return top[np.argsort(-scores[top], kind="stable")].astype(np.int64)
+
+if NUMBA_AVAILABLE:
+    # Сигнатура задана явно: компіляція при імпорті (і кеш на диску), а не
+    # на першому запиті пошуку
+    @njit("int64[:](float32[:], int64)", cache=True, fastmath=True, boundscheck=False)
+    def _topk_kernel(scores, k):
+        """Top-k за один прохід: відсортований буфер з ``k`` кращих.
+
+        Для типових ``k`` (одиниці-десятки) майже всі значення відсіюються
+        одним порівнянням з найгіршим у буфері, тож це O(n) без копій і
+        сортування всього масиву, як у ``argpartition``.
+        """
+        n = scores.shape[0]
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        top = np.empty(k, dtype=np.int64)
+        best = np.empty(k, dtype=np.float32)
+        size = 0
+        for i in range(n):
+            score = scores[i]
+            if size == k:
+                if score <= best[k - 1]:
+                    continue
+                j = k - 1
+            else:
+                j = size
+                size += 1
+            # Вставка зі зсувом гірших значень вправо
+            while j > 0 and best[j - 1] < score:
+                best[j] = best[j - 1]
+                top[j] = top[j - 1]
+                j -= 1
+            best[j] = score
+            top[j] = i
+        return top
+
+    def _topk(scores: np.ndarray, k: int) -> np.ndarray:
+        return _topk_kernel(np.ascontiguousarray(scores, dtype=np.float32), k)
+
+    _SCORE_SIGNATURE = "void(float32[::1], float32[:, ::1], float32[::1])"
+    _SCORE_INT8_SIGNATURE = "void(float32[::1], int8[:, ::1], float32[::1], float32[::1])"
+
+    @njit(_SCORE_SIGNATURE, parallel=True, fastmath=True, cache=True)
+    def _score_parallel(query, docs, out):
+        """Скалярні добутки рядків ``docs`` з ``query`` на всіх ядрах"""
+        for i in prange(docs.shape[0]):
+            acc = np.float32(0.0)
+            for j in range(docs.shape[1]):
+                acc += query[j] * docs[i, j]
+            out[i] = acc
+
+    @njit(_SCORE_SIGNATURE, fastmath=True, cache=True)
+    def _score_serial(query, docs, out):
+        """Те саме ядро без потоків: запасний варіант для ``_score_parallel``"""
+        for i in range(docs.shape[0]):
+            acc = np.float32(0.0)
+            for j in range(docs.shape[1]):
+                acc += query[j] * docs[i, j]
+            out[i] = acc
+
+    @njit(_SCORE_INT8_SIGNATURE, parallel=True, fastmath=True, cache=True)
+    def _score_int8_parallel(query, docs, scales, out):
+        """Скоринг int8 рядків з масштабом на рядок, накопичення у float32"""
+        for i in prange(docs.shape[0]):
+            acc = np.float32(0.0)
+            for j in range(docs.shape[1]):
+                acc += query[j] * np.float32(docs[i, j])
+            out[i] = acc * scales[i]
+
+    @njit(_SCORE_INT8_SIGNATURE, fastmath=True, cache=True)
+    def _score_int8_serial(query, docs, scales, out):
+        """Послідовний варіант ``_score_int8_parallel``"""
+        for i in range(docs.shape[0]):
+            acc = np.float32(0.0)
+            for j in range(docs.shape[1]):
+                acc += query[j] * np.float32(docs[i, j])
+            out[i] = acc * scales[i]
+
+    _parallel_ok = True
+
+    def _run_kernel(parallel, serial, n: int, *args):
+        """Паралельне ядро для великих матриць, інакше (або при збої) - послідовне"""
+        global _parallel_ok
+
+        if _parallel_ok and n >= PARALLEL_MIN_ROWS:
+            try:
+                parallel(*args)
+                return
+            except Exception as e:
+                # Шар потоків Numba (NUMBA_THREADING_LAYER) недоступний
+                logger.warning(f"Паралельне ядро Numba недоступне, послідовний режим: {e}")
+                _parallel_ok = False
+        serial(*args)
+
+    def _score(query: np.ndarray, docs: np.ndarray) -> np.ndarray:
+        """Схожість ``query`` з кожним рядком C-суцільної матриці ``docs``"""
+        query = np.ascontiguousarray(query, dtype=np.float32)
+        out = np.empty(docs.shape[0], dtype=np.float32)
+        _run_kernel(_score_parallel, _score_serial, docs.shape[0], query, docs, out)
+        return out
+
+    def _score_int8(query: np.ndarray, docs: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        """Схожість ``query`` з рядками int8 матриці ``docs * scales[:, None]``"""
+        query = np.ascontiguousarray(query, dtype=np.float32)
+        out = np.empty(docs.shape[0], dtype=np.float32)
+        _run_kernel(
+            _score_int8_parallel, _score_int8_serial, docs.shape[0], query, docs, scales, out
+        )
+        return out
+
+    def warmup_kernels():
+        """Прогрів ядер Numba до першого запиту.
+
+        Самі ядра компілюються при імпорті (явні сигнатури, кеш на диску), а
+        тут запускається шар потоків паралельних варіантів: перший виклик
+        ``prange`` ініціалізує пул потоків, а якщо шар недоступний - ядра
+        одразу переходять у послідовний режим.
+        """
+        query = np.zeros(1, dtype=np.float32)
+        out = np.empty(1, dtype=np.float32)
+        _topk(query, 1)
+        # n = PARALLEL_MIN_ROWS: примусово паралельні варіанти
+        _run_kernel(
+            _score_parallel, _score_serial, PARALLEL_MIN_ROWS,
+            query, np.zeros((1, 1), dtype=np.float32), out
+        )
+        _run_kernel(
+            _score_int8_parallel, _score_int8_serial, PARALLEL_MIN_ROWS,
+            query, np.zeros((1, 1), dtype=np.int8), np.ones(1, dtype=np.float32), out
+        )
+        logger.info(f"Ядра Numba прогріто (паралельний режим: {_parallel_ok})")
+else:
+    _topk = _topk_numpy
+
+    def warmup_kernels():
+        logger.info("Numba не встановлено, пошук в NumpyIndex через numpy/BLAS")
+
+class FaissIndex:
+    """In-process дзеркало колекції для гарячого шляху пошуку.
+
+    ChromaDB лишається джерелом істини для збереження, а тут тримаються
+    нормалізовані ембедінги (``IndexFlatIP``: скалярний добуток = косинусна
+    схожість) разом з текстами та метаданими, тож пошук - це один SIMD
+    прохід у C без звернень до SQLite. Плоский індекс обрано замість HNSW,
+    бо HNSW у FAISS не підтримує видалення, а колекція змінюється.
+
+    ``dtype`` "float16" / "int8" зберігає вектори скалярним квантизатором
+    (``IndexScalarQuantizer``): у 2 / 4 рази менше пам'яті та трафіку DRAM
+    на пошук, скалярні добутки рахуються у float32.
+    """
+
+    def __init__(self, dim: int, dtype: str = "float32"):
+        if not FAISS_AVAILABLE:
+            raise RuntimeError("faiss не встановлено")
+        if dtype not in INDEX_DTYPES:
+            raise ValueError(f"Непідтримуваний тип індексу: {dtype}")
+
+        self.dim = dim
+        self.dtype = dtype
+        if dtype == "float32":
+            base = faiss.IndexFlatIP(dim)
+        else:
+            qtype = (
+                faiss.ScalarQuantizer.QT_fp16 if dtype == "float16"
+                else faiss.ScalarQuantizer.QT_8bit_uniform
+            )
+            base = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+            if not base.is_trained:
+                # Ембедінги нормалізовані, тож кожна компонента в [-1, 1]
+                base.train(np.array([[-1.0] * dim, [1.0] * dim], dtype=np.float32))
+        self._index = faiss.IndexIDMap(base)
+        self._next_label = 0
+        self._labels: Dict[str, int] = {}
+        self._docs: Dict[int, Tuple[str, str, Dict[str, Any]]] = {}
+
+    def add(
+        self,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+        embeddings: np.ndarray
+    ):
+        """Додавання (або заміна) записів"""
+        self.remove(ids)
+
+        labels = np.arange(self._next_label, self._next_label + len(ids), dtype=np.int64)
+        self._next_label += len(ids)
+        self._index.add_with_ids(np.ascontiguousarray(embeddings, dtype=np.float32), labels)
+
+        for label, doc_id, doc, meta in zip(labels.tolist(), ids, documents, metadatas):
+            self._labels[doc_id] = label
+            self._docs[label] = (doc_id, doc, meta)
+
+    def remove(self, ids: Sequence[str]):
+        """Видалення записів за ID (відсутні ігноруються)"""
+        labels = [self._labels.pop(doc_id) for doc_id in ids if doc_id in self._labels]
+        if not labels:
+            return
+
+        for label in labels:
+            del self._docs[label]
+        self._index.remove_ids(np.asarray(labels, dtype=np.int64))
+
+    def search(self, embedding: np.ndarray, k: int) -> List[IndexHit]:
+        """Top-k записів за косинусною схожістю"""
+        if not self._docs:
+            return []
+
+        query = np.ascontiguousarray(embedding, dtype=np.float32).reshape(1, -1)
+        scores, labels = self._index.search(query, min(k, len(self._docs)))
+        return [
+            (*self._docs[label], score)
+            for score, label in zip(scores[0].tolist(), labels[0].tolist())
+            if label != -1
+        ]
+
+    def reset(self):
+        """Очищення індексу"""
+        self._index.reset()
+        self._labels.clear()
+        self._docs.clear()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+class NumpyIndex:
+    """In-process дзеркало колекції на numpy (без FAISS).
+
+    Дані зберігаються стовпцями (SoA): матриця ембедінгів ``(N, dim)``, що
+    росте подвоєнням ємності, та паралельні списки ID, текстів і метаданих.
+    Пошук - один BLAS GEMV ``embs @ q`` (на великих матрицях - паралельне
+    ядро Numba з ``prange``) і top-k ядром Numba (або ``argpartition``, якщо
+    Numba не встановлено), без ітерації по записах у Python.
+
+    Скоринг впирається в пропускну здатність пам'яті, тож ``dtype`` "int8"
+    (квантизація з масштабом на рядок) зменшує трафік у 4 рази: ядро Numba
+    накопичує добутки у float32. "float16" ні BLAS, ні Numba на CPU не
+    рахують напряму, тому тут він лише економить пам'ять ціною повільнішого
+    скорингу: блоки матриці перетворюються у float32 перед GEMV.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024, dtype: str = "float32"):
+        if dtype not in INDEX_DTYPES:
+            raise ValueError(f"Непідтримуваний тип індексу: {dtype}")
+
+        self.dim = dim
+        self.dtype = dtype
+        self._embs = np.empty((capacity, dim), dtype=dtype)
+        # Масштаб рядка для int8: embedding ~= embs[i] * scales[i]
+        self._scales = np.ones(capacity, dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metas: List[Dict[str, Any]] = []
+        self._pos: Dict[str, int] = {}
+
+    def add(
+        self,
+        ids: Sequence[str],
+        documents: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+        embeddings: np.ndarray
+    ):
+        """Додавання (або заміна) записів"""
+        self.remove(ids)
+
+        count = len(ids)
+        self._reserve(self._size + count)
+        self._store(self._size, np.asarray(embeddings, dtype=np.float32))
+        for offset, doc_id in enumerate(ids, self._size):
+            self._pos[doc_id] = offset
+        self._size += count
+        self._ids.extend(ids)
+        self._texts.extend(documents)
+        self._metas.extend(metadatas)
+
+    def remove(self, ids: Sequence[str]):
+        """Видалення записів за ID (відсутні ігноруються)"""
+        for doc_id in ids:
+            pos = self._pos.pop(doc_id, None)
+            if pos is None:
+                continue
+
+            # Останній запис переноситься на місце видаленого: O(1)
+            last = self._size - 1
+            if pos != last:
+                self._embs[pos] = self._embs[last]
+                self._scales[pos] = self._scales[last]
+                self._ids[pos] = self._ids[last]
+                self._texts[pos] = self._texts[last]
+                self._metas[pos] = self._metas[last]
+                self._pos[self._ids[pos]] = pos
+            self._ids.pop()
+            self._texts.pop()
+            self._metas.pop()
+            self._size = last
+
+    def search(self, embedding: np.ndarray, k: int) -> List[IndexHit]:
+        """Top-k записів за косинусною схожістю"""
+        if self._size == 0:
+            return []
+
+        scores = self._scores(np.asarray(embedding, dtype=np.float32))
+        top = _topk(scores, k)
+        return [
+            (self._ids[i], self._texts[i], self._metas[i], score)
+            for i, score in zip(top.tolist(), scores[top].tolist())
+        ]
+
+    def reset(self):
+        """Очищення індексу"""
+        self._size = 0
+        self._ids.clear()
+        self._texts.clear()
+        self._metas.clear()
+        self._pos.clear()
+
+    def _store(self, start: int, embeddings: np.ndarray):
+        """Запис ембедінгів у матрицю з квантизацією під ``dtype``"""
+        stop = start + len(embeddings)
+        if self.dtype == "int8":
+            scales = np.abs(embeddings).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._embs[start:stop] = np.rint(embeddings / scales[:, None])
+            self._scales[start:stop] = scales
+        else:
+            self._embs[start:stop] = embeddings
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """Схожість ``query`` з усіма записами"""
+        embs = self._embs[:self._size]
+        if self.dtype == "float32":
+            if NUMBA_AVAILABLE and self._size >= PARALLEL_MIN_ROWS:
+                return _score(query, embs)
+            return embs @ query
+        if self.dtype == "int8" and NUMBA_AVAILABLE:
+            return _score_int8(query, embs, self._scales[:self._size])
+
+        scores = np.empty(self._size, dtype=np.float32)
+        for start in range(0, self._size, SCORE_BLOCK_ROWS):
+            block = embs[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        if self.dtype == "int8":
+            scores *= self._scales[:self._size]
+        return scores
+
+    def _reserve(self, size: int):
+        """Подвоєння ємності матриці, якщо ``size`` не вміщується"""
+        if size <= len(self._embs):
+            return
+
+        capacity = max(size, 2 * len(self._embs))
+        embs = np.empty((capacity, self.dim), dtype=self.dtype)
+        embs[:self._size] = self._embs[:self._size]
+        self._embs = embs
+        scales = np.ones(capacity, dtype=np.float32)
+        scales[:self._size] = self._scales[:self._size]
+        self._scales = scales
+
+    def __len__(self) -> int:
+        return self._size
@@ -1,30 +1,57 @@
 # rag-service/app/main.py
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import Depends, FastAPI, HTTPException, Request, UploadFile, File
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from contextlib import asynccontextmanager
 import uvicorn
-from typing import List, Optional
+from typing import List, Optional, Set
 import asyncio
 import logging
 from pathlib import Path
 
+import aiofiles
+import httpx
+import msgspec
+from pydantic import BaseModel, ValidationError
+
 from .core.rag_engine import RAGEngine
+from .core.ingestion import IngestionQueue
+from .core.tasks import ARQ_AVAILABLE, TaskQueue
 from .core.document_processor import DocumentProcessor
-from .models.document import DocumentMetadata, SearchRequest, SearchResponse, DocumentUploadResponse
+from .models.document import (
+    DocumentMetadata, SearchRequest, SearchQuery, SearchResponse, DocumentUploadResponse,
+    URLRequest, URLProcessingResponse, decode_errors, search_decoder
+)
 from .config import settings
 
 # Налаштування логування
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Розмір блоку потокового запису завантажених файлів
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Заголовки для завантаження веб-сторінок
+UA_HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; rag-service/1.0)"}
+
 # Глобальні змінні для RAG компонентів
 rag_engine: Optional[RAGEngine] = None
 document_processor: Optional[DocumentProcessor] = None
+http_client: Optional[httpx.AsyncClient] = None
+ingestion_queue: Optional[IngestionQueue] = None
+
+# Обмеження паралельної обробки завантажених файлів
+ingest_semaphore: Optional[asyncio.Semaphore] = None
+# Посилання на фонові задачі, щоб їх не прибрав GC
+ingest_tasks: Set[asyncio.Task] = set()
+# Черга задач на Redis (None - обробка локальними фоновими задачами)
+task_queue: Optional[TaskQueue] = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle manager для FastAPI"""
-    global rag_engine, document_processor
+    global rag_engine, document_processor, http_client, ingestion_queue, ingest_semaphore, task_queue
     
     logger.info("Ініціалізація RAG системи...")
     
@@ -32,16 +59,61 @@ async def lifespan(app: FastAPI):
         # Ініціалізація компонентів
         document_processor = DocumentProcessor(
             chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            tokenizer_name=settings.EMBEDDING_MODEL if settings.TOKEN_CHUNKING else None,
+            max_tokens=settings.CHUNK_TOKENS,
+            token_overlap=settings.CHUNK_TOKEN_OVERLAP
         )
         
         rag_engine = RAGEngine(
             db_path=settings.CHROMA_DB_DIR,
             embedding_model=settings.EMBEDDING_MODEL,
-            collection_name=settings.COLLECTION_NAME
+            collection_name=settings.COLLECTION_NAME,
+            semantic_cache_threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            semantic_cache_size=settings.SEMANTIC_CACHE_SIZE,
+            embedding_backend=settings.EMBEDDING_BACKEND,
+            onnx_file_name=settings.EMBEDDING_ONNX_FILE,
+            embedding_batch_size=settings.EMBEDDING_BATCH_SIZE,
+            vector_index=settings.VECTOR_INDEX,
+            vector_index_dtype=settings.VECTOR_INDEX_DTYPE,
+            redis_url=settings.REDIS_URL if settings.EMBEDDING_CACHE else None,
+            embedding_cache_ttl=settings.EMBEDDING_CACHE_TTL
         )
         
         await rag_engine.initialize()
+        
+        ingestion_queue = IngestionQueue(
+            rag_engine,
+            batch_size=settings.INGEST_BATCH_SIZE,
+            flush_interval=settings.INGEST_FLUSH_INTERVAL
+        )
+        ingestion_queue.start()
+        ingest_semaphore = asyncio.Semaphore(settings.INGEST_CONCURRENCY)
+        
+        # Спільний HTTP клієнт для завантаження URL (пул з'єднань, HTTP/2)
+        http_client = httpx.AsyncClient(
+            http2=True,
+            follow_redirects=True,
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            headers=UA_HEADERS
+        )
+        
+        # Надійна черга обробки з повторами та DLQ, якщо доступний Redis
+        if settings.REDIS_URL and ARQ_AVAILABLE:
+            try:
+                task_queue = TaskQueue(
+                    settings.REDIS_URL,
+                    handlers=INGEST_HANDLERS,
+                    max_jobs=settings.TASK_QUEUE_MAX_JOBS,
+                    job_timeout=settings.TASK_JOB_TIMEOUT,
+                    max_tries=settings.TASK_MAX_TRIES
+                )
+                await task_queue.start()
+            except Exception as e:
+                logger.warning(f"Redis недоступний, обробка локальними задачами: {e}")
+                await task_queue.stop()
+                task_queue = None
         logger.info("RAG система успішно ініціалізована")
         
         yield
@@ -51,6 +123,14 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         # Cleanup
+        if task_queue:
+            await task_queue.stop()
+        if ingest_tasks:
+            await asyncio.gather(*ingest_tasks, return_exceptions=True)
+        if ingestion_queue:
+            await ingestion_queue.stop()
+        if http_client:
+            await http_client.aclose()
         if rag_engine:
             await rag_engine.close()
         logger.info("RAG система зупинена")
@@ -59,6 +139,7 @@ app = FastAPI(
     title="RAG Service API",
     description="API для RAG системи з підтримкою різних форматів документів",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -87,10 +168,7 @@ async def health_check():
     }
 
 @app.post("/documents/upload", response_model=DocumentUploadResponse)
-async def upload_documents(
-    background_tasks: BackgroundTasks,
-    files: List[UploadFile] = File(...)
-):
+async def upload_documents(files: List[UploadFile] = File(...)):
     """Завантаження документів"""
     global rag_engine, document_processor
     
@@ -103,20 +181,23 @@ async def upload_documents(
         try:
             # Збереження файлу
             file_path = Path(settings.UPLOAD_DIR) / file.filename
-            file_path.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(file_path.parent.mkdir, parents=True, exist_ok=True)
             
-            content = await file.read()
-            with open(file_path, "wb") as f:
-                f.write(content)
+            # Потоковий запис блоками, без буферизації всього файлу
+            size = 0
+            async with aiofiles.open(file_path, "wb") as f:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    await f.write(chunk)
+                    size += len(chunk)
             
             uploaded_files.append({
                 "filename": file.filename,
-                "size": len(content),
+                "size": size,
                 "path": str(file_path)
             })
             
-            # Обробка в фоні
-            background_tasks.add_task(process_uploaded_file, str(file_path))
+            # Обробка в фоні (не більше INGEST_CONCURRENCY файлів одночасно)
+            await schedule_ingestion("process_file", str(file_path))
             
         except Exception as e:
             logger.error(f"Помилка завантаження файлу {file.filename}: {e}")
@@ -130,58 +211,76 @@ async def upload_documents(
 
 async def process_uploaded_file(file_path: str):
     """Фонова обробка завантаженого файлу"""
-    global rag_engine, document_processor
+    global document_processor, ingestion_queue, ingest_semaphore
     
     try:
-        logger.info(f"Обробка файлу: {file_path}")
-        
-        # Обробка документу
-        chunks = document_processor.process_file(file_path)
+        async with ingest_semaphore:
+            logger.info(f"Обробка файлу: {file_path}")
+            
+            # Обробка документу
+            chunks = await document_processor.process_file_async(file_path)
         
         if chunks:
-            # Додавання до векторної бази
-            await rag_engine.add_documents(chunks)
-            logger.info(f"Додано {len(chunks)} чанків з файлу {file_path}")
+            # Додавання до черги індексації та очікування запису батчу, щоб
+            # помилка ембедінгів/ChromaDB дійшла до повторів і DLQ
+            committed = await ingestion_queue.put(chunks)
+            await committed
+            logger.info(f"{len(chunks)} чанків з файлу {file_path} проіндексовано")
         else:
             logger.warning(f"Не вдалося витягти контент з файлу {file_path}")
             
     except Exception as e:
         logger.error(f"Помилка обробки файлу {file_path}: {e}")
+        raise
 
-@app.post("/documents/url")
+@app.post("/documents/url", response_model=URLProcessingResponse)
 async def add_url(
-    background_tasks: BackgroundTasks,
-    url: str,
+    body: Optional[URLRequest] = None,
+    url: Optional[str] = None,
     title: Optional[str] = None
 ):
-    """Додавання контенту з URL"""
+    """Додавання контенту з URL.
+
+    URL передається JSON тілом (``URLRequest``); параметри запиту ``url`` і
+    ``title`` підтримуються для сумісності з попередньою версією API.
+    """
     global rag_engine, document_processor
     
+    if body is not None:
+        request = body
+    elif url is not None:
+        try:
+            request = URLRequest(url=url, title=title)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    else:
+        raise HTTPException(status_code=422, detail="Потрібен URL у тілі запиту або параметрі url")
+    
     if not rag_engine or not document_processor:
         raise HTTPException(status_code=503, detail="Сервіс не готовий")
     
     try:
         # Обробка в фоні
-        background_tasks.add_task(process_url, url, title)
+        await schedule_ingestion("process_url", request.url, request.title)
         
-        return {
-            "message": f"URL {url} додано до черги обробки",
-            "status": "processing"
-        }
+        return URLProcessingResponse(
+            message=f"URL {request.url} додано до черги обробки",
+            status="processing"
+        )
         
     except Exception as e:
-        logger.error(f"Помилка додавання URL {url}: {e}")
+        logger.error(f"Помилка додавання URL {request.url}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 async def process_url(url: str, title: Optional[str] = None):
     """Фонова обробка URL"""
-    global rag_engine, document_processor
+    global document_processor, http_client, ingestion_queue
     
     try:
         logger.info(f"Обробка URL: {url}")
         
         # Обробка URL
-        url_data = document_processor.process_url(url)
+        url_data = await document_processor.process_url_async(url, http_client)
         
         # Створення чанків
         chunks = document_processor.chunk_text(
@@ -195,16 +294,66 @@ async def process_url(url: str, title: Optional[str] = None):
         )
         
         if chunks:
-            await rag_engine.add_documents(chunks)
-            logger.info(f"Додано {len(chunks)} чанків з URL {url}")
+            committed = await ingestion_queue.put(chunks)
+            await committed
+            logger.info(f"{len(chunks)} чанків з URL {url} проіндексовано")
         else:
             logger.warning(f"Не вдалося витягти контент з URL {url}")
             
     except Exception as e:
         logger.error(f"Помилка обробки URL {url}: {e}")
+        raise
 
-@app.post("/search", response_model=SearchResponse)
-async def search_documents(request: SearchRequest):
+# Обробники задач за іменами (для arq та локального запуску)
+INGEST_HANDLERS = {
+    "process_file": process_uploaded_file,
+    "process_url": process_url,
+}
+
+async def schedule_ingestion(name: str, *args):
+    """Постановка обробки в чергу Redis або запуск локальної фонової задачі"""
+    if task_queue is not None:
+        await task_queue.enqueue(name, *args)
+        return
+    
+    task = asyncio.create_task(_run_local(name, *args))
+    ingest_tasks.add(task)
+    task.add_done_callback(ingest_tasks.discard)
+
+async def _run_local(name: str, *args):
+    """Локальне виконання задачі без повторів (без Redis немає DLQ)"""
+    try:
+        await INGEST_HANDLERS[name](*args)
+    except Exception as e:
+        logger.error(f"Задача {name}{args} невдала, повтори без Redis недоступні: {e}")
+
+def _encode_model(obj):
+    """Pydantic моделі (SearchResult з кешів engine) як словник полів"""
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise NotImplementedError(f"Тип {type(obj).__name__} не серіалізується")
+
+# Енкодер /search створюється один раз (декодер - поруч із SearchQuery)
+search_encoder = msgspec.json.Encoder(enc_hook=_encode_model)
+
+async def parse_search_query(request: Request) -> SearchQuery:
+    """Тіло /search через msgspec замість валідації Pydantic; помилки -
+    у звичному форматі 422 FastAPI (``detail`` зі списком помилок)"""
+    try:
+        return search_decoder.decode(await request.body())
+    except msgspec.DecodeError as e:
+        # ValidationError - підклас DecodeError
+        raise RequestValidationError(decode_errors(e))
+
+@app.post(
+    "/search",
+    response_model=SearchResponse,
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": SearchRequest.model_json_schema()}}
+    }}
+)
+async def search_documents(request: SearchQuery = Depends(parse_search_query)):
     """Семантичний пошук документів"""
     global rag_engine
     
@@ -218,10 +367,15 @@ async def search_documents(request: SearchRequest):
             filter_metadata=request.filter_metadata
         )
         
-        return SearchResponse(
-            query=request.query,
-            results=results,
-            total_found=len(results)
+        # Відповідь у форматі SearchResponse, закодована msgspec напряму
+        return Response(
+            content=search_encoder.encode({
+                "query": request.query,
+                "results": results,
+                "total_found": len(results),
+                "processing_time": None
+            }),
+            media_type="application/json"
         )
         
     except Exception as e:
@@ -274,10 +428,15 @@ async def get_document_sources():
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
+    # Один воркер: модель, FAISS дзеркало та локальна ChromaDB живуть у
+    # пам'яті процесу, а PersistentClient не розрахований на кілька процесів
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=8000,
+        host=settings.API_HOST,
+        port=settings.API_PORT,
+        workers=1,
+        loop="uvloop",
+        http="httptools",
         reload=False,
         log_level="info"
     )
\ No newline at end of file
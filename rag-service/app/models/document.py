@@ -1,7 +1,10 @@
 # rag-service/app/models/document.py
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, List, Dict, Any, Optional
 from datetime import datetime
+import re
+
+import msgspec
 
 class DocumentMetadata(BaseModel):
     source: str
@@ -18,13 +21,48 @@ class SearchRequest(BaseModel):
     filter_metadata: Optional[Dict[str, Any]] = None
     include_metadata: bool = True
 
+class SearchQuery(msgspec.Struct):
+    """Тіло ``/search`` для швидкого декодера msgspec (ті самі поля й
+    обмеження, що й у ``SearchRequest``, який лишається схемою OpenAPI)"""
+    query: Annotated[str, msgspec.Meta(min_length=1, max_length=1000)]
+    limit: Annotated[int, msgspec.Meta(ge=1, le=50)] = 5
+    filter_metadata: Optional[Dict[str, Any]] = None
+    include_metadata: bool = True
+
+# Декодер тіла /search. strict=False приводить рядки до чисел і bool
+# ("limit": "5"), як lax режим Pydantic, що раніше валідував /search
+search_decoder = msgspec.json.Decoder(SearchQuery, strict=False)
+
+_MISSING_FIELD_RE = re.compile(r"Object missing required field `(.+)`")
+_PATH_PART_RE = re.compile(r"\.([^.\[`]+)|\[(\d+)\]")
+
+def decode_errors(error: msgspec.DecodeError) -> List[Dict[str, Any]]:
+    """Помилка msgspec у форматі помилок валідації FastAPI/Pydantic
+    (``[{"loc", "msg", "type"}]``), щоб 422 від /search не змінив контракт"""
+    if not isinstance(error, msgspec.ValidationError):
+        return [{"loc": ["body"], "msg": f"Invalid JSON: {error}", "type": "json_invalid"}]
+
+    # "Expected `int` >= 1 - at `$.limit`" -> повідомлення і шлях до поля
+    msg, _, path = str(error).partition(" - at `$")
+    loc: List[Any] = ["body"]
+    loc.extend(key or int(index) for key, index in _PATH_PART_RE.findall(path))
+
+    missing = _MISSING_FIELD_RE.fullmatch(msg)
+    if missing:
+        return [{"loc": loc + [missing.group(1)], "msg": "Field required", "type": "missing"}]
+    return [{"loc": loc, "msg": msg, "type": "value_error"}]
+
 class SearchResult(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
     id: str
     text: str
     metadata: Dict[str, Any]
     score: float = Field(..., ge=0.0, le=1.0)
 
 class SearchResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    
     query: str
     results: List[SearchResult]
     total_found: int
@@ -38,6 +76,10 @@ class DocumentUploadResponse(BaseModel):
 class URLRequest(BaseModel):
     url: str = Field(..., pattern=r'^https?://.+')
     title: Optional[str] = None
+
+class URLProcessingResponse(BaseModel):
+    message: str
+    status: str  # "processing"
     
 class DocumentStatsResponse(BaseModel):
     total_documents: int
@@ -0,0 +1,87 @@
+"""Small parsing helpers shared by the document processing code.
+
+HTML is converted to text with ``selectolax`` (the C ``lexbor`` engine) when
+it is installed, which is an order of magnitude faster and lighter than
+walking a BeautifulSoup tree.  Without it, precompiled regular expressions
+strip non-text elements and tags in a few linear scans; no DOM is built.
+
+Both paths join text the way a browser lays it out: block-level elements
+start a new line, while inline markup (``<b>``, ``<a>``, ``<span>`` ...) is
+removed without adding whitespace, so ``Hello <b>w</b>orld`` stays
+``Hello world``.
+"""
+
+from __future__ import annotations
+
+import re
+from html import unescape
+from typing import Optional, Tuple, Union
+
+try:  # selectolax is optional; the regex fallback is always available
+    from selectolax.parser import HTMLParser  # type: ignore
+
+    SELECTOLAX_AVAILABLE = True
+except Exception:  # pragma: no cover - dependency is optional
+    SELECTOLAX_AVAILABLE = False
+
+from bs4 import UnicodeDammit
+
+# Elements whose content is never part of the readable text
+SKIP_TAGS = ["script", "style", "noscript"]
+
+# Elements that start a new line of text
+BLOCK_TAGS = [
+    "address", "article", "aside", "blockquote", "body", "br", "dd", "div",
+    "dl", "dt", "fieldset", "figcaption", "figure", "footer", "form", "h[1-6]",
+    "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table",
+    "tbody", "td", "tfoot", "th", "thead", "title", "tr", "ul",
+]
+
+# Patterns for the regex fallback, compiled once at import
+_TITLE_RE = re.compile(r"<title\b[^>]*>(.*?)</title\s*>", re.S | re.I)
+_SKIP_RE = re.compile(
+    r"<(%s|title)\b[^>]*>.*?</\1\s*>|<!--.*?-->" % "|".join(SKIP_TAGS), re.S | re.I
+)
+_TAG_RE = re.compile(r"<[^>]*>")
+# Position just before an opening or closing block-level tag
+_BLOCK_RE = re.compile(r"<(?=/?(?:%s)\b)" % "|".join(BLOCK_TAGS), re.I)
+_BLANK_RE = re.compile(r"\s*\n\s*")
+
+
+def extract_html(html: Union[str, bytes]) -> Tuple[Optional[str], str]:
+    """Return ``(title, text)`` for an HTML document.
+
+    ``title`` is ``None`` when the document has no non-empty ``<title>``.
+    """
+
+    if isinstance(html, bytes):
+        # Honours BOMs and <meta charset> like the BeautifulSoup parser did
+        html = UnicodeDammit(html, is_html=True).unicode_markup or ""
+
+    # Line breaks go in front of block tags; every other tag joins its
+    # neighbours directly
+    html = _BLOCK_RE.sub("\n<", html)
+
+    if SELECTOLAX_AVAILABLE:
+        tree = HTMLParser(html)
+        title_node = tree.css_first("title")
+        title = title_node.text(strip=True) if title_node else None
+        tree.strip_tags(SKIP_TAGS)
+        root = tree.body or tree.root
+        text = root.text(separator="", strip=False) if root else ""
+        return title or None, _BLANK_RE.sub("\n", text).strip()
+
+    match = _TITLE_RE.search(html)
+    title = unescape(_TAG_RE.sub("", match.group(1))).strip() if match else None
+
+    text = unescape(_TAG_RE.sub("", _SKIP_RE.sub("\n", html)))
+    return title or None, _BLANK_RE.sub("\n", text).strip()
+
+
+def html_to_text(html: Union[str, bytes]) -> str:
+    """Return the readable text of an HTML document or fragment."""
+
+    return extract_html(html)[1]
+
+
+__all__ = ["SELECTOLAX_AVAILABLE", "extract_html", "html_to_text"]
@@ -5,14 +5,21 @@ diagnose.py - Діагностика RAG системи
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import sys
 import time
 from typing import Dict, List, Tuple, Optional
 import subprocess
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:  # orjson не обов'язковий для скрипта
+    orjson = None
+
 class RAGDiagnostics:
     def __init__(self):
         self.services = {
@@ -44,6 +51,12 @@ class RAGDiagnostics:
         }
         
         self.results = []
+        
+        # Одна сесія з keep-alive пулом для всіх HTTP перевірок
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
     def print_header(self):
         print("=" * 60)
@@ -86,7 +99,7 @@ class RAGDiagnostics:
             return True, "No HTTP endpoint"
         
         try:
-            response = requests.get(url, timeout=timeout)
+            response = self.session.get(url, timeout=timeout)
             if response.status_code == 200:
                 return True, f"OK ({response.status_code})"
             else:
@@ -112,10 +125,22 @@ class RAGDiagnostics:
         print("🔍 Перевірка здоров'я сервісів...")
         print("-" * 60)
         
+        # Паралельні перевірки: загальний час = найповільніший сервіс
+        with ThreadPoolExecutor(max_workers=len(self.services)) as executor:
+            checks = dict(zip(self.services, executor.map(
+                lambda item: self.check_service_health(item[0], item[1]['url']),
+                self.services.items()
+            )))
+            failed = [name for name, (healthy, _) in checks.items() if not healthy]
+            logs = dict(zip(failed, executor.map(
+                lambda name: self.get_container_logs(self.services[name]['container'], 5),
+                failed
+            )))
+        
         for name, config in self.services.items():
             print(f"Перевірка {name}...", end=" ")
             
-            healthy, message = self.check_service_health(name, config['url'])
+            healthy, message = checks[name]
             config['healthy'] = healthy
             
             if healthy:
@@ -125,8 +150,7 @@ class RAGDiagnostics:
                 
                 # Показуємо логи для проблемних сервісів
                 print(f"📋 Останні логи {config['container']}:")
-                logs = self.get_container_logs(config['container'], 5)
-                for line in logs.split('\n')[-5:]:
+                for line in logs[name].split('\n')[-5:]:
                     if line.strip():
                         print(f"  {line}")
                 print()
@@ -167,9 +191,9 @@ class RAGDiagnostics:
         if self.services['RAG Service']['healthy']:
             try:
                 # Тест пошуку
-                response = requests.post('http://localhost:8002/search', 
-                                       json={'query': 'test', 'limit': 1}, 
-                                       timeout=10)
+                response = self.session.post('http://localhost:8002/search', 
+                                             json={'query': 'test', 'limit': 1}, 
+                                             timeout=10)
                 if response.status_code == 200:
                     print("✅ RAG пошук працює")
                 else:
@@ -180,7 +204,7 @@ class RAGDiagnostics:
         # Тест LLM Service
         if self.services['LLM Service']['healthy']:
             try:
-                response = requests.get('http://localhost:8003/models', timeout=10)
+                response = self.session.get('http://localhost:8003/models', timeout=10)
                 if response.status_code == 200:
                     print("✅ LLM сервіс працює")
                     models = response.json()
@@ -231,8 +255,12 @@ class RAGDiagnostics:
         }
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2, ensure_ascii=False)
+            if orjson is not None:
+                with open(filename, 'wb') as f:
+                    f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+            else:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    json.dump(results, f, indent=2, ensure_ascii=False)
             print(f"💾 Результати збережено в {filename}")
         except Exception as e:
             print(f"❌ Помилка збереження: {e}")
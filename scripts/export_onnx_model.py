@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+export_onnx_model.py - Експорт моделі ембедінгів в оптимізований ONNX
+Створює O3-оптимізовану та int8 (динамічно квантовану) версії моделі
+для CPU-інференсу в rag-service.
+
+Використання:
+    python scripts/export_onnx_model.py --output ./models/all-MiniLM-L6-v2
+
+Після експорту встановіть EMBEDDING_MODEL на директорію з моделлю та
+EMBEDDING_ONNX_FILE на потрібний файл, наприклад
+onnx/model_qint8_avx512_vnni.onnx.
+"""
+
+import argparse
+import sys
+
+from sentence_transformers import SentenceTransformer
+from sentence_transformers.backend import (
+    export_dynamic_quantized_onnx_model,
+    export_optimized_onnx_model,
+)
+
+
+def main():
+    """Головна функція"""
+    parser = argparse.ArgumentParser(description="Експорт моделі ембедінгів в ONNX")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2",
+                        help="Назва або шлях моделі")
+    parser.add_argument("--output", required=True,
+                        help="Директорія для збереження моделі")
+    parser.add_argument("--quantization", default="avx512_vnni",
+                        choices=["arm64", "avx2", "avx512", "avx512_vnni"],
+                        help="Конфігурація int8 квантування під цільовий CPU")
+    args = parser.parse_args()
+
+    try:
+        model = SentenceTransformer(args.model, backend="onnx")
+        model.save_pretrained(args.output)
+
+        print("⚙️  Експорт O3-оптимізованої моделі...")
+        export_optimized_onnx_model(model, "O3", args.output)
+
+        print(f"⚙️  Експорт int8 моделі ({args.quantization})...")
+        export_dynamic_quantized_onnx_model(model, args.quantization, args.output)
+    except Exception as e:
+        print(f"❌ Помилка експорту: {e}")
+        sys.exit(1)
+
+    print(f"✅ Модель збережено в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
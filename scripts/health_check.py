@@ -1,18 +1,227 @@
 #!/usr/bin/env python3
 # scripts/health_check.py - Перевірка здоров'я всіх компонентів RAG системи
 
-import requests
-import json
+import asyncio
+import os
 import sys
 import time
-from typing import Dict, List, Tuple
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+try:  # HTTP/2 у httpx потребує пакет h2; без нього - HTTP/1.1 keep-alive
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# ChromaDB вбудована в RAG Service (PersistentClient), окремо не перевіряється
+DEFAULT_SERVICES = {
+    'RAG Service': 'http://localhost:8002/health',
+    'LLM Service': 'http://localhost:8003/health',
+    'Ollama': 'http://localhost:11434/api/tags',
+    'Frontend': 'http://localhost:3000',
+    'Redis': 'redis://localhost:6379'
+}
+
+# Максимум одночасних перевірок (окремо від ліміту пулу з'єднань клієнта)
+HEALTHCHECK_CONCURRENCY = int(os.environ.get('HEALTHCHECK_CONCURRENCY', '10'))
+
+# Без перевірки TLS сертифікатів (лише для self-signed стендів): --insecure
+HEALTHCHECK_INSECURE = os.environ.get('HEALTHCHECK_INSECURE', '').lower() in ('1', 'true', 'yes')
 
 class HealthChecker:
-    def __init__(self):
-        self.services = {
-            'ChromaDB': 'http://localhost:8001/api/v1/heartbeat',
-            'RAG Service': 'http://localhost:8002/health',
-            'LLM Service': 'http://localhost:8003/health',
-            'Ollama': 'http://localhost:11434/api/tags',
-            'Frontend': 'http://localhost:3000',
-            'Redis': '
\ No newline at end of file
+    """Перевірка сервісів; використовуйте ``async with HealthChecker() as hc``,
+    щоб повторні перевірки йшли через ті самі keep-alive з'єднання.
+
+    Для https сервісів (наприклад, за одним reverse proxy) клієнт домовляється
+    про HTTP/2, і паралельні перевірки одного хоста йдуть потоками одного
+    з'єднання. Локальні http:// сервіси перевіряються по HTTP/1.1.
+    Сертифікати перевіряються завжди, крім ``insecure=True``.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        connect_timeout: float = 1.0,
+        read_timeout: float = 3.0,
+        cache_ttl: float = 60.0,
+        services: Optional[Dict[str, str]] = None,
+        concurrency: int = HEALTHCHECK_CONCURRENCY,
+        insecure: bool = HEALTHCHECK_INSECURE
+    ):
+        self.services = dict(services or DEFAULT_SERVICES)
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.insecure = insecure
+        self._client: Optional[httpx.AsyncClient] = None
+        # Обмеження одночасних перевірок: десятки сервісів не відкривають
+        # десятки сокетів разом і не навантажують цілі одночасно
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # Кеш результатів за URL: (час перевірки, результат)
+        self.cache_ttl = cache_ttl
+        self._cache: Dict[str, Tuple[float, Tuple[str, bool, str, float]]] = {}
+        # Перевірки, що виконуються зараз: одна на URL (single-flight)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Спільний клієнт з пулом з'єднань (створюється при першій перевірці)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                verify=not self.insecure,
+                timeout=httpx.Timeout(
+                    self.timeout, connect=self.connect_timeout, read=self.read_timeout
+                ),
+                limits=httpx.Limits(
+                    max_connections=32, max_keepalive_connections=20, keepalive_expiry=60
+                )
+            )
+        return self._client
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "HealthChecker":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _probe_redis(self, url: str) -> Tuple[bool, str]:
+        """PING по TCP: Redis не має HTTP endpoint"""
+        parsed = urlparse(url)
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parsed.hostname, parsed.port or 6379), self.connect_timeout
+        )
+        try:
+            writer.write(b"PING\r\n")
+            await writer.drain()
+            reply = await asyncio.wait_for(reader.readline(), self.read_timeout)
+        finally:
+            writer.close()
+        return reply.startswith(b"+PONG"), reply.decode(errors="replace").strip()
+
+    async def _probe(self, client: httpx.AsyncClient, name: str, url: str) -> Tuple[str, bool, str, float]:
+        """Перевірка одного сервісу: (назва, здоровий, деталі, час у мс)"""
+        start = time.perf_counter()
+        try:
+            if url.startswith('redis://'):
+                healthy, message = await self._probe_redis(url)
+            else:
+                response = await client.get(url)
+                healthy = response.status_code < 500
+                message = f"{response.http_version} {response.status_code}"
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            healthy, message = False, "Timeout"
+        except (httpx.ConnectError, OSError):
+            healthy, message = False, "Connection refused"
+        except Exception as e:
+            healthy, message = False, f"Error: {e}"
+        return name, healthy, message, (time.perf_counter() - start) * 1000
+
+    async def check_service(self, name: str, url: str, force: bool = False) -> Tuple[str, bool, str, float]:
+        """Перевірка сервісу з кешем на ``cache_ttl`` секунд (``force`` - без кешу).
+
+        Одночасні виклики для одного URL чекають на одну спільну перевірку,
+        а не запускають кожен свою (``force`` теж: вона щойно розпочата).
+        """
+        now = time.monotonic()
+        cached = self._cache.get(url)
+        if not force and cached is not None and now - cached[0] < self.cache_ttl:
+            return cached[1]
+
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.create_task(self._probe_and_cache(name, url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # shield: скасування одного з очікуючих не скасовує спільну перевірку
+        return await asyncio.shield(task)
+
+    async def _probe_and_cache(self, name: str, url: str) -> Tuple[str, bool, str, float]:
+        async with self._semaphore:
+            result = await self._probe(self._get_client(), name, url)
+        self._cache[url] = (time.monotonic(), result)
+        return result
+
+    async def check_all(self, force: bool = False, deadline: Optional[float] = None) -> Dict[str, Dict]:
+        """Паралельна перевірка всіх сервісів: загальний час = найповільніший.
+
+        Результати забираються в міру завершення (``asyncio.wait`` з
+        FIRST_COMPLETED), без опитування зі сном. Перевірки, що не встигли за
+        ``deadline`` секунд (за замовчуванням ``timeout``), скасовуються.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        end = start + (self.timeout if deadline is None else deadline)
+        tasks = {
+            asyncio.create_task(self.check_service(name, url, force)): name
+            for name, url in self.services.items()
+        }
+
+        results = {}
+        pending = set(tasks)
+        while pending:
+            remaining = end - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                name = tasks[task]
+                error = task.exception()
+                results[name] = (name, False, f"Error: {error}", 0.0) if error else task.result()
+
+        for task in pending:
+            task.cancel()
+            results[tasks[task]] = (tasks[task], False, "Timeout", (loop.time() - start) * 1000)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        status = {}
+        for name, url in self.services.items():
+            _, healthy, message, elapsed = results[name]
+            status[name] = {
+                'url': url,
+                'healthy': healthy,
+                'message': message,
+                'response_time_ms': round(elapsed, 1)
+            }
+        return status
+
+    def print_report(self, status: Dict[str, Dict]):
+        print("=" * 60)
+        print("🏥 RAG SYSTEM HEALTH CHECK")
+        print("=" * 60)
+        for name, info in status.items():
+            icon = "✅" if info['healthy'] else "❌"
+            print(f"{icon} {name:<12} {info['message']:<20} {info['response_time_ms']:>8.1f} ms")
+        print("-" * 60)
+        healthy = sum(1 for info in status.values() if info['healthy'])
+        print(f"📊 Здорових сервісів: {healthy}/{len(status)}")
+
+
+async def run(insecure: bool = HEALTHCHECK_INSECURE) -> Dict[str, Dict]:
+    async with HealthChecker(insecure=insecure) as checker:
+        status = await checker.check_all()
+    checker.print_report(status)
+    return status
+
+
+def main():
+    insecure = HEALTHCHECK_INSECURE or '--insecure' in sys.argv[1:]
+    status = asyncio.run(run(insecure))
+    sys.exit(0 if all(info['healthy'] for info in status.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Shared pytest setup.
+
+The services are not installable packages, so their source roots are put on
+``sys.path``: ``app`` resolves to rag-service and ``health_check`` to the
+script.  llm-service also names its package ``app`` and is loaded by path in
+its own test module.
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+for path in (ROOT / "rag-service", ROOT / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
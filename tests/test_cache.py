@@ -0,0 +1,96 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.core.cache import REDIS_AVAILABLE, RedisEmbeddingCache, SemanticCache
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_semantic_cache_hits_similar_queries_only():
+    cache = SemanticCache(threshold=0.95)
+    cache.add(unit(1, 0, 0), "result", scope=5)
+
+    assert cache.lookup(unit(1, 0.05, 0), scope=5) == "result"
+    assert cache.lookup(unit(0, 1, 0), scope=5) is None
+    assert cache.lookup(unit(1, 0, 0), scope=3) is None
+
+
+def test_semantic_cache_evicts_oldest_and_clears():
+    cache = SemanticCache(threshold=0.99, max_entries=2)
+    for i, axis in enumerate(np.eye(3, dtype=np.float32)):
+        cache.add(axis, i)
+
+    assert len(cache) == 2
+    assert cache.lookup(np.eye(3, dtype=np.float32)[0]) is None
+    assert cache.lookup(np.eye(3, dtype=np.float32)[2]) == 2
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+class FakeRedis:
+    def __init__(self, fail=False):
+        self.data = {}
+        self.fail = fail
+
+    async def mget(self, keys):
+        if self.fail:
+            raise ConnectionError("redis down")
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def set(self, key, value, ex=None):
+        self.ops.append((key, value))
+
+    async def execute(self):
+        if self.redis.fail:
+            raise ConnectionError("redis down")
+        self.redis.data.update(self.ops)
+
+
+@pytest.fixture
+def emb_cache():
+    if not REDIS_AVAILABLE:
+        pytest.skip("redis не встановлено")
+    cache = RedisEmbeddingCache("redis://localhost:6379", "model-a")
+    cache._redis = FakeRedis()
+    return cache
+
+
+def test_redis_embedding_cache_round_trip(emb_cache):
+    embeddings = np.stack([unit(1, 2, 3), unit(3, 2, 1)])
+
+    asyncio.run(emb_cache.set_many(["a", "b"], embeddings))
+    hits = asyncio.run(emb_cache.get_many(["a", " b ", "c"]))
+
+    np.testing.assert_allclose(hits[0], embeddings[0], atol=1e-3)
+    np.testing.assert_allclose(hits[1], embeddings[1], atol=1e-3)
+    assert hits[0].dtype == np.float32
+    assert hits[2] is None
+
+
+def test_redis_embedding_cache_keys_depend_on_model(emb_cache):
+    other = RedisEmbeddingCache("redis://localhost:6379", "model-b")
+
+    assert emb_cache._key("text") == emb_cache._key("  text\n")
+    assert emb_cache._key("text") != other._key("text")
+
+
+def test_redis_errors_are_treated_as_misses(emb_cache):
+    emb_cache._redis.fail = True
+
+    asyncio.run(emb_cache.set_many(["a"], np.stack([unit(1, 0, 0)])))
+    assert asyncio.run(emb_cache.get_many(["a", "b"])) == [None, None]
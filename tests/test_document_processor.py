@@ -0,0 +1,120 @@
+import re
+
+import numpy as np
+
+from app.core.document_processor import ChunkBatch, DocumentProcessor, _decode_text
+from app.utils.helpers import extract_html, html_to_text
+
+
+class WordTokenizer:
+    """Minimal stand-in for a fast HF tokenizer: one token per word."""
+
+    CLS, SEP = 101, 102
+
+    def __call__(self, text, **kwargs):
+        matches = list(re.finditer(r"\S+", text))
+        ids = np.array([[1000 + i for i in range(len(matches))]], dtype=np.int64)
+        offsets = np.array([[m.span() for m in matches]], dtype=np.int64).reshape(1, -1, 2)
+        return {"input_ids": ids, "offset_mapping": offsets}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def build_inputs_with_special_tokens(self, ids):
+        return [self.CLS, *ids, self.SEP]
+
+
+def token_processor(max_tokens=6, token_overlap=1):
+    processor = DocumentProcessor(max_tokens=max_tokens, token_overlap=token_overlap)
+    processor._tokenizer = WordTokenizer()
+    return processor
+
+
+def test_token_windows_are_overlapping_exact_substrings():
+    text = "w0 w1  w2 w3\nw4 w5 w6 w7 w8 w9"
+    processor = token_processor(max_tokens=6, token_overlap=1)
+
+    spans, input_ids = processor._token_windows(text, processor._tokenizer)
+
+    # 4 tokens per window (6 minus [CLS]/[SEP]), step 3
+    chunks = [text[start:end] for start, end in spans]
+    assert chunks == ["w0 w1  w2 w3", "w3\nw4 w5 w6", "w6 w7 w8 w9"]
+    assert input_ids[0] == [101, 1000, 1001, 1002, 1003, 102]
+    assert all(len(ids) <= 6 for ids in input_ids)
+
+
+def test_token_windows_short_and_empty_text():
+    processor = token_processor(max_tokens=6, token_overlap=2)
+
+    assert processor._token_windows("", processor._tokenizer) == ([], [])
+    spans, input_ids = processor._token_windows("only", processor._tokenizer)
+    assert spans == [(0, 4)]
+    assert input_ids == [[101, 1000, 102]]
+
+
+def test_chunk_text_by_tokens_fills_metadata_and_ids():
+    processor = token_processor()
+    batch = processor.chunk_text(" ".join(f"w{i}" for i in range(10)), {"source": "doc"})
+
+    assert len(batch) == 3
+    assert batch.token_ids() == batch.input_ids
+    assert [m["chunk_id"] for m in batch.metadatas] == [0, 1, 2]
+    assert all(m["total_chunks"] == 3 and m["source"] == "doc" for m in batch.metadatas)
+
+
+def test_chunk_text_by_characters_without_tokenizer():
+    processor = DocumentProcessor(chunk_size=10, chunk_overlap=2)
+    text = "abcdefghij" * 2 + "klmno"
+
+    batch = processor.chunk_text(text, {"source": "doc"})
+
+    assert batch.texts == [text[0:10], text[8:18], text[16:26], text[24:34]]
+    assert batch.token_ids() is None
+    assert processor.chunk_text("", {"source": "doc"}).texts == []
+
+
+def test_chunk_batch_extend_drops_ids_of_mixed_batches():
+    with_ids = ChunkBatch(["a"], [{"chunk_id": 0}], [[1, 2]])
+    without_ids = ChunkBatch(["b"], [{"chunk_id": 0}])
+
+    batch = ChunkBatch()
+    batch.extend(with_ids)
+    assert batch.token_ids() == [[1, 2]]
+
+    batch.extend(without_ids)
+    assert batch.texts == ["a", "b"]
+    assert batch.token_ids() is None
+
+
+def test_extract_html_keeps_inline_markup_joined():
+    title, text = extract_html(
+        "<html><head><title>T &amp; x</title><style>p {}</style></head>"
+        "<body><p>Hello <b>w</b>orld</p><p>Second<br>line <a href='#'>link</a>.</p>"
+        "<script>var x = 1 < 2;</script><ul><li>a</li><li>b</li></ul></body></html>"
+    )
+
+    assert title == "T & x"
+    assert text == "Hello world\nSecond\nline link.\na\nb"
+
+
+def test_html_to_text_decodes_bytes():
+    assert html_to_text("<p>café <i>ok</i></p>".encode("utf-8")) == "café ok"
+    assert extract_html("<div>no title</div>") == (None, "no title")
+
+
+CYRILLIC = "Привіт, світе! Це тестовий рядок українською мовою.\n"
+ASCII_PREFIX = "plain ascii line of the file header\n" * 2000  # > ENCODING_SNIFF_BYTES
+
+
+def test_decode_text_keeps_utf8_with_a_late_stray_byte():
+    raw = (ASCII_PREFIX + CYRILLIC * 100).encode() + b"\xff" + (CYRILLIC * 100).encode()
+
+    text = _decode_text(raw)
+
+    assert text == ASCII_PREFIX + CYRILLIC * 100 + "\ufffd" + CYRILLIC * 100
+
+
+def test_decode_text_detects_legacy_encoding_after_ascii_prefix():
+    raw = (ASCII_PREFIX + CYRILLIC * 200).encode("cp1251")
+
+    assert _decode_text(raw) == ASCII_PREFIX + CYRILLIC * 200
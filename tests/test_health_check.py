@@ -0,0 +1,90 @@
+import asyncio
+
+import health_check
+
+
+def checker_with_probe(delay=0.0, **kwargs):
+    """HealthChecker whose network probe is replaced by a counting fake"""
+    checker = health_check.HealthChecker(**kwargs)
+    checker.calls = []
+    checker.active = checker.peak = 0
+
+    async def probe(client, name, url):
+        checker.calls.append(url)
+        checker.active += 1
+        checker.peak = max(checker.peak, checker.active)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            checker.active -= 1
+        return name, True, "HTTP/1.1 200", delay * 1000
+
+    checker._probe = probe
+    return checker
+
+
+def test_results_are_cached_for_ttl():
+    async def scenario():
+        async with checker_with_probe(cache_ttl=60) as checker:
+            await checker.check_service("a", "http://a/health")
+            await checker.check_service("a", "http://a/health")
+            await checker.check_service("a", "http://a/health", force=True)
+            return checker.calls
+
+    assert len(asyncio.run(scenario())) == 2
+
+
+def test_deadline_reports_slow_probes_as_timeout():
+    services = {"fast": "http://fast/health", "slow": "http://slow/health"}
+
+    async def scenario():
+        async with health_check.HealthChecker(services=services) as checker:
+            async def probe(client, name, url):
+                await asyncio.sleep(0 if name == "fast" else 10)
+                return name, True, "HTTP/1.1 200", 1.0
+
+            checker._probe = probe
+            return await checker.check_all(deadline=0.05)
+
+    status = asyncio.run(scenario())
+    assert status["fast"]["healthy"] is True
+    assert status["slow"]["healthy"] is False
+    assert status["slow"]["message"] == "Timeout"
+    assert list(status) == ["fast", "slow"]
+
+
+def test_concurrency_limit_bounds_in_flight_probes():
+    services = {f"s{i}": f"http://s{i}/health" for i in range(6)}
+
+    async def scenario():
+        async with checker_with_probe(delay=0.01, services=services, concurrency=2) as checker:
+            status = await checker.check_all()
+            return checker.peak, status
+
+    peak, status = asyncio.run(scenario())
+    assert peak == 2
+    assert all(info["healthy"] for info in status.values())
+
+
+def test_concurrent_checks_of_one_url_share_a_probe():
+    async def scenario():
+        async with checker_with_probe(delay=0.02) as checker:
+            results = await asyncio.gather(*(
+                checker.check_service("a", "http://a/health", force=True) for _ in range(10)
+            ))
+            return checker, results
+
+    checker, results = asyncio.run(scenario())
+    assert checker.calls == ["http://a/health"]
+    assert len(set(results)) == 1
+    assert checker._inflight == {}
+
+
+def test_tls_is_verified_unless_insecure(monkeypatch):
+    created = []
+    monkeypatch.setattr(health_check.httpx, "AsyncClient", lambda **kwargs: created.append(kwargs) or object())
+
+    health_check.HealthChecker()._get_client()
+    health_check.HealthChecker(insecure=True)._get_client()
+
+    assert [kwargs["verify"] for kwargs in created] == [True, False]
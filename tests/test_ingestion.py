@@ -0,0 +1,63 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.core.document_processor import ChunkBatch
+from app.core.ingestion import IngestionQueue
+
+
+class FakeEngine:
+    def __init__(self):
+        self.fail = False
+        self.batches = []
+
+    async def encode_batch(self, texts, input_ids=None):
+        return np.zeros((len(texts), 4), dtype=np.float32)
+
+    async def add_documents_batch(self, ids, texts, metadatas, embeddings):
+        if self.fail:
+            raise RuntimeError("chroma down")
+        self.batches.append(list(texts))
+
+
+def chunks(*texts):
+    return ChunkBatch(list(texts), [{"source": text} for text in texts])
+
+
+def test_put_resolves_after_the_batch_is_written():
+    async def scenario():
+        engine = FakeEngine()
+        queue = IngestionQueue(engine, batch_size=10, flush_interval=0.05)
+        queue.start()
+        first = await queue.put(chunks("a", "b"))
+        second = await queue.put(chunks("c"))
+
+        await asyncio.gather(first, second)
+        await queue.stop()
+        return engine.batches
+
+    # Both documents go into one write
+    assert asyncio.run(scenario()) == [["a", "b", "c"]]
+
+
+def test_batch_failure_reaches_every_submitter():
+    async def scenario():
+        engine = FakeEngine()
+        engine.fail = True
+        queue = IngestionQueue(engine, batch_size=10, flush_interval=0.05)
+        queue.start()
+        futures = [await queue.put(chunks("a")), await queue.put(chunks("b"))]
+
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        await queue.stop()
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) and str(r) == "chroma down" for r in results)
+
+
+def test_put_requires_started_queue():
+    queue = IngestionQueue(FakeEngine())
+    with pytest.raises(RuntimeError):
+        asyncio.run(queue.put(chunks("a")))
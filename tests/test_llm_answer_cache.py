@@ -0,0 +1,95 @@
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+# llm-service also names its package ``app``, so its module is loaded by path
+_MAIN = Path(__file__).resolve().parent.parent / "llm-service" / "app" / "main.py"
+_spec = importlib.util.spec_from_file_location("llm_service_main", _MAIN)
+llm = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(llm)
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    """``_prepare_chat`` with RAG search and model warm-up replaced by fakes"""
+    state = {"results": [], "warmed": []}
+
+    async def search(session, message):
+        return {"results": [
+            {"id": doc_id, "text": f"text {doc_id}", "metadata": {"source": "s"}, "score": 0.9}
+            for doc_id in state["results"]
+        ]}
+
+    async def warm(session, model):
+        state["warmed"].append(model)
+
+    monkeypatch.setattr(llm, "_search_context", search)
+    monkeypatch.setattr(llm, "_warm_model", warm)
+    monkeypatch.setattr(llm, "_answer_cache", llm.OrderedDict())
+    monkeypatch.setattr(llm, "_warm_tasks", {})
+
+    def prepare(message="What is RAG?"):
+        async def run():
+            prepared = await llm._prepare_chat(None, llm.ChatRequest(message=message))
+            await asyncio.sleep(0)  # let the background warm-up run
+            return prepared
+        return asyncio.run(run())
+
+    state["prepare"] = prepare
+    return state
+
+
+def test_jaccard():
+    assert llm._jaccard(set(), set()) == 1.0
+    assert llm._jaccard({"a", "b"}, {"b", "c"}) == pytest.approx(1 / 3)
+
+
+def test_answer_cache_key_normalizes_whitespace_and_case():
+    a = llm.ChatRequest(message="  What is   RAG? ")
+    b = llm.ChatRequest(message="what is rag?")
+
+    assert llm._answer_cache_key(a) == llm._answer_cache_key(b)
+
+
+def test_cached_answer_needs_matching_evidence(chat):
+    chat["results"] = [f"c{i}" for i in range(5)]
+    first = chat["prepare"]()
+    assert first["cached_response"] is None
+    llm._store_answer(first, "answer")
+
+    # 4 of 5 chunks unchanged: Jaccard 4/6 < 0.8, the answer may be stale
+    chat["results"] = ["c0", "c1", "c2", "c3", "new"]
+    assert chat["prepare"]()["cached_response"] is None
+
+    chat["results"] = [f"c{i}" for i in range(5)]
+    assert chat["prepare"](" what is rag? ")["cached_response"] == "answer"
+
+
+def test_answers_without_context_are_not_cached(chat):
+    prepared = chat["prepare"]()
+    llm._store_answer(prepared, "answer")
+
+    assert prepared["prompt"] == "What is RAG?"
+    assert len(llm._answer_cache) == 0
+
+
+
+def test_warm_up_skipped_for_cached_questions(chat):
+    chat["results"] = ["c0"]
+    llm._store_answer(chat["prepare"](), "answer")
+    assert chat["warmed"] == ["llama3.1:8b"]
+
+    chat["prepare"]()
+    assert chat["warmed"] == ["llama3.1:8b"]
+
+
+def test_keep_alive_is_sent_only_when_configured(monkeypatch):
+    request = llm.ChatRequest(message="hi")
+
+    monkeypatch.setattr(llm, "OLLAMA_KEEP_ALIVE", None)
+    assert "keep_alive" not in llm._generate_payload(request, "hi", stream=False)
+
+    monkeypatch.setattr(llm, "OLLAMA_KEEP_ALIVE", "24h")
+    assert llm._generate_payload(request, "hi", stream=True)["keep_alive"] == "24h"
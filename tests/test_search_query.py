@@ -0,0 +1,45 @@
+import pytest
+
+msgspec = pytest.importorskip("msgspec")
+
+from pydantic import ValidationError
+
+from app.models.document import SearchRequest, decode_errors, search_decoder
+
+
+def decode_error(body):
+    with pytest.raises(msgspec.DecodeError) as info:
+        search_decoder.decode(body)
+    return decode_errors(info.value)
+
+
+def test_numeric_strings_are_coerced_like_pydantic():
+    query = search_decoder.decode(b'{"query": "rag", "limit": "5", "include_metadata": "false"}')
+
+    assert (query.query, query.limit, query.include_metadata) == ("rag", 5, False)
+    assert SearchRequest.model_validate_json(b'{"query": "rag", "limit": "5"}').limit == 5
+
+
+@pytest.mark.parametrize("body", [
+    b'{"limit": 3}',
+    b'{"query": ""}',
+    b'{"query": "rag", "limit": 0}',
+    b'{"query": "rag", "limit": "abc"}',
+    b'{"query": "rag", "filter_metadata": [1]}',
+])
+def test_errors_have_pydantic_shape_and_location(body):
+    with pytest.raises(ValidationError) as expected:
+        SearchRequest.model_validate_json(body)
+
+    [error] = decode_error(body)
+
+    assert set(error) == {"loc", "msg", "type"}
+    assert error["loc"] == ["body", *expected.value.errors()[0]["loc"]]
+    assert error["msg"]
+
+
+def test_missing_field_and_invalid_json_types():
+    assert decode_error(b'{"limit": 3}') == [
+        {"loc": ["body", "query"], "msg": "Field required", "type": "missing"}
+    ]
+    assert decode_error(b'{"query":')[0]["type"] == "json_invalid"
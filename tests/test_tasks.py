@@ -0,0 +1,52 @@
+import asyncio
+
+import orjson
+import pytest
+
+pytest.importorskip("arq")
+
+from arq.worker import Retry
+
+from app.core.tasks import DLQ_KEY, TaskQueue
+
+
+class FakeRedis:
+    def __init__(self):
+        self.lists = {}
+
+    async def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value)
+
+
+def slow_queue(job_timeout=0.2):
+    async def slow(path):
+        await asyncio.sleep(10)
+
+    queue = TaskQueue("redis://localhost:6379", {"process_file_task": slow}, job_timeout=job_timeout)
+    queue._redis = FakeRedis()
+    return queue, queue._wrap("process_file_task", slow)
+
+
+def test_handler_timeout_leaves_room_before_job_timeout():
+    assert TaskQueue("redis://localhost:6379", {}, job_timeout=300).handler_timeout == 290
+    assert TaskQueue("redis://localhost:6379", {}, job_timeout=4).handler_timeout == 2
+
+
+def test_timed_out_job_is_retried():
+    queue, job = slow_queue()
+
+    with pytest.raises(Retry):
+        asyncio.run(job({"job_try": 1, "job_id": "j1"}, "/data/big.pdf"))
+    assert queue._redis.lists == {}
+
+
+def test_timed_out_last_try_goes_to_dlq():
+    queue, job = slow_queue()
+
+    asyncio.run(job({"job_try": queue.max_tries, "job_id": "j1"}, "/data/big.pdf"))
+
+    [entry] = [orjson.loads(raw) for raw in queue._redis.lists[DLQ_KEY]]
+    assert entry["job_id"] == "j1"
+    assert entry["args"] == ["/data/big.pdf"]
+    assert entry["tries"] == queue.max_tries
+    assert "перевищено час" in entry["error"]
@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+
+from app.core import vector_index
+from app.core.vector_index import FAISS_AVAILABLE, NUMBA_AVAILABLE, NumpyIndex
+
+
+def unit_vectors(count, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(index, vectors):
+    ids = [f"id{i}" for i in range(len(vectors))]
+    index.add(ids, [f"text{i}" for i in ids], [{"n": i} for i in range(len(vectors))], vectors)
+    return ids
+
+
+def index_factories():
+    factories = [pytest.param(NumpyIndex, id="numpy")]
+    if FAISS_AVAILABLE:
+        factories.append(pytest.param(vector_index.FaissIndex, id="faiss"))
+    return factories
+
+
+@pytest.fixture(params=index_factories())
+def index_cls(request):
+    return request.param
+
+
+def test_topk_numpy_orders_by_score():
+    scores = np.array([0.1, 0.9, 0.3, 0.7], dtype=np.float32)
+
+    assert vector_index._topk_numpy(scores, 2).tolist() == [1, 3]
+    assert vector_index._topk_numpy(scores, 10).tolist() == [1, 3, 2, 0]
+    assert vector_index._topk_numpy(scores, 0).tolist() == []
+
+
+@pytest.mark.parametrize("dtype", vector_index.INDEX_DTYPES)
+def test_search_returns_nearest_first(index_cls, dtype):
+    vectors = unit_vectors(50)
+    index = index_cls(16, dtype=dtype)
+    fill(index, vectors)
+
+    hits = index.search(vectors[7], 3)
+
+    assert len(hits) == 3
+    doc_id, text, meta, score = hits[0]
+    assert (doc_id, text, meta) == ("id7", "textid7", {"n": 7})
+    assert score == pytest.approx(1.0, abs=0.02)
+    assert [h[3] for h in hits] == sorted((h[3] for h in hits), reverse=True)
+
+
+def test_add_replaces_existing_id(index_cls):
+    vectors = unit_vectors(3)
+    index = index_cls(16)
+    fill(index, vectors)
+
+    index.add(["id0"], ["new"], [{"n": "new"}], vectors[2:3])
+
+    assert len(index) == 3
+    hits = index.search(vectors[2], 2)
+    assert {h[0] for h in hits} == {"id0", "id2"}
+    assert any(h[1] == "new" for h in hits)
+
+
+def test_remove_keeps_remaining_records_consistent(index_cls):
+    vectors = unit_vectors(6)
+    index = index_cls(16)
+    ids = fill(index, vectors)
+
+    # Removing from the middle moves the last record into the freed slot
+    index.remove(["id1", "id3", "missing"])
+
+    assert len(index) == 4
+    for i in (0, 2, 4, 5):
+        assert index.search(vectors[i], 1)[0][:3] == (ids[i], f"text{ids[i]}", {"n": i})
+    assert all(h[0] not in ("id1", "id3") for h in index.search(vectors[1], 4))
+
+
+def test_reset_and_empty_search(index_cls):
+    index = index_cls(16)
+    assert index.search(unit_vectors(1)[0], 5) == []
+
+    fill(index, unit_vectors(4))
+    index.reset()
+
+    assert len(index) == 0
+    assert index.search(unit_vectors(1)[0], 5) == []
+
+
+def test_numpy_index_grows_past_capacity():
+    vectors = unit_vectors(10)
+    index = NumpyIndex(16, capacity=2, dtype="int8")
+    fill(index, vectors)
+
+    assert len(index) == 10
+    assert index.search(vectors[9], 1)[0][0] == "id9"
+
+
+def test_int8_storage_quantizes_per_row():
+    vectors = unit_vectors(20) * np.linspace(0.1, 10, 20, dtype=np.float32)[:, None]
+    index = NumpyIndex(16, dtype="int8")
+    fill(index, vectors)
+
+    query = np.full(16, 0.25, dtype=np.float32)
+    error = np.abs(index._scores(query) - vectors @ query)
+    # Half a quantization step per component bounds the error by |row| * sqrt(dim) / 254
+    assert np.all(error <= 0.016 * np.linalg.norm(vectors, axis=1))
+
+
+def test_unknown_dtype_is_rejected():
+    with pytest.raises(ValueError):
+        NumpyIndex(16, dtype="bfloat16")
+
+
+# Without numba these kernels are NOT verified: install tests/requirements.txt
+@pytest.mark.skipif(not NUMBA_AVAILABLE, reason="numba не встановлено: Numba-ядра не перевірено")
+class TestNumbaKernels:
+    def test_topk_kernel_matches_numpy(self):
+        scores = np.random.default_rng(1).standard_normal(1000).astype(np.float32)
+        for k in (1, 5, 1000, 2000):
+            assert vector_index._topk(scores, k).tolist() == vector_index._topk_numpy(scores, k).tolist()
+
+    @pytest.mark.parametrize("parallel_rows", [1, 10**9])
+    def test_score_kernels_match_matmul(self, monkeypatch, parallel_rows):
+        # parallel_rows=1 forces the prange kernels, 10**9 the serial ones
+        monkeypatch.setattr(vector_index, "PARALLEL_MIN_ROWS", parallel_rows)
+        docs = unit_vectors(100)
+        quantized = np.round(docs * 127).astype(np.int8)
+        scales = np.full(100, 1 / 127, dtype=np.float32)
+
+        np.testing.assert_allclose(vector_index._score(docs[0], docs), docs @ docs[0], atol=1e-5)
+        np.testing.assert_allclose(
+            vector_index._score_int8(docs[0], quantized, scales),
+            (quantized @ docs[0]) / 127,
+            atol=1e-5,
+        )
+
+    def test_parallel_failure_falls_back_to_serial(self, monkeypatch):
+        def broken(*args):
+            raise RuntimeError("no threading layer")
+
+        monkeypatch.setattr(vector_index, "_score_parallel", broken)
+        monkeypatch.setattr(vector_index, "_parallel_ok", True)
+        monkeypatch.setattr(vector_index, "PARALLEL_MIN_ROWS", 1)
+        docs = unit_vectors(10)
+
+        np.testing.assert_allclose(vector_index._score(docs[0], docs), docs @ docs[0], atol=1e-5)
+        assert vector_index._parallel_ok is False
+
+
+def test_float16_keeps_exact_top_k(index_cls):
+    # Clustered vectors resemble real embeddings more than isotropic noise
+    rng = np.random.default_rng(2)
+    centers = rng.standard_normal((20, 64))
+    vectors = (centers[rng.integers(0, 20, 2000)] + 0.7 * rng.standard_normal((2000, 64))).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = index_cls(64, dtype="float16")
+    ids = fill(index, vectors)
+
+    for query in vectors[:20]:
+        exact = {ids[i] for i in np.argsort(-(vectors @ query))[:10]}
+        assert {h[0] for h in index.search(query, 10)} == exact